@@ -0,0 +1,159 @@
+"""Benchmark the decoding of large serverinfo responses.
+
+    python benchmarks/bench_decode.py [--effects 2000] [--leds 1000]
+
+Compares the previous `json.loads(msg.decode())` with `decode.decode`, then
+measures the worst event loop stall while a burst of large responses is
+handled inline and through the `Decoder`.
+Needs the test requirements (Home Assistant) installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.hyperhdr_mqtt.decode import (  # noqa: E402
+    EXECUTOR_THRESHOLD,
+    Decoder,
+    decode,
+    orjson,
+)
+
+
+def serverinfo(effects: int, leds: int, instances: int = 4) -> bytes:
+    """A serverinfo response like a big installation sends it."""
+    side = max(1, leds // 4)
+    info = {
+        "hostname": "hyperhdr",
+        "currentInstance": 0,
+        "instance": [
+            {"instance": i, "friendly_name": f"Instance {i}", "running": True}
+            for i in range(instances)
+        ],
+        "components": [
+            {"name": name, "enabled": True}
+            for name in ("ALL", "HDR", "SMOOTHING", "BLACKBORDER", "LEDDEVICE")
+        ],
+        "adjustment": [{"brightness": 100, "id": "default", "gammaRed": 1.5}],
+        "activeLedColor": [{"RGB Value": [255, 120, 0]}],
+        "activeEffects": [],
+        "effects": [
+            {
+                "name": f"Custom effect {n}",
+                "file": f"/config/effects/custom_{n}.json",
+                "args": {"speed": 1.0, "color": [255, 0, 0], "reverse": False},
+            }
+            for n in range(effects)
+        ],
+        "leds": [
+            {
+                "hmin": (i % side) / side,
+                "hmax": (i % side + 1) / side,
+                "vmin": 0.0,
+                "vmax": 0.08,
+            }
+            for i in range(leds)
+        ],
+        "priorities": [
+            {
+                "priority": 240,
+                "componentId": "VIDEOGRABBER",
+                "origin": "System",
+                "active": True,
+                "visible": True,
+            }
+        ],
+        "grabbers": {
+            "active": ["USB3 Video"],
+            "available": [f"Video device {n}" for n in range(20)],
+            "modes": [
+                {"width": w, "height": h, "fps": f, "format": "NV12"}
+                for w, h in ((1920, 1080), (1280, 720), (640, 480))
+                for f in (30, 50, 60)
+            ],
+        },
+        "ledDevices": {"active": "adalight", "available": ["adalight"] * 40},
+    }
+    return json.dumps(
+        [
+            {"command": "instance-switchTo", "success": True, "tan": 0},
+            {"command": "serverinfo", "success": True, "info": info, "tan": 0},
+        ]
+    ).encode()
+
+
+def bench_decode(msg: bytes, number: int):
+    baseline = timeit.timeit(lambda: json.loads(msg.decode()), number=number)
+    current = timeit.timeit(lambda: decode(msg), number=number)
+    print(f"payload: {len(msg) / 1024:.0f} KiB, orjson: {orjson is not None}")
+    print(f"  json.loads(msg.decode()) {baseline / number * 1000:8.3f} ms")
+    print(f"  decode(msg)              {current / number * 1000:8.3f} ms")
+    print(f"  speedup                  {baseline / current:8.1f}x")
+
+
+async def loop_stall(msg: bytes, burst: int, threshold: int) -> tuple[float, float]:
+    """Worst loop wake up delay and total time to handle `burst` messages."""
+    loop = asyncio.get_running_loop()
+    handled = 0
+    done = asyncio.Event()
+    max_lag = 0.0
+
+    def handler(payload):
+        nonlocal handled
+        handled += 1
+        if handled == burst:
+            done.set()
+
+    async def probe():
+        nonlocal max_lag
+        while not done.is_set():
+            start = loop.time()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, loop.time() - start - 0.001)
+
+    decoder = Decoder(loop, handler, threshold)
+    probe_task = loop.create_task(probe())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for _ in range(burst):
+        # One message per loop iteration like the broker dispatch.
+        loop.call_soon(decoder.feed, msg)
+    await done.wait()
+    total = time.perf_counter() - start
+    await probe_task
+    return max_lag * 1000, total * 1000
+
+
+async def bench_loop(msg: bytes, burst: int):
+    print(f"burst of {burst} responses:")
+    for label, threshold in (
+        ("inline", len(msg) + 1),
+        (f"executor >= {EXECUTOR_THRESHOLD // 1024} KiB", EXECUTOR_THRESHOLD),
+    ):
+        lag, total = await loop_stall(msg, burst, threshold)
+        print(f"  {label:<22} max loop lag {lag:7.2f} ms, total {total:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--effects", type=int, default=2000)
+    parser.add_argument("--leds", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=20)
+    args = parser.parse_args()
+
+    msg = serverinfo(args.effects, args.leds)
+    bench_decode(msg, args.number)
+    asyncio.run(bench_loop(msg, args.burst))
+
+
+if __name__ == "__main__":
+    main()
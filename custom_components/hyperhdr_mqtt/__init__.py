@@ -1,36 +1,62 @@
 """The HyperHDR MQTT integration."""
 
 from __future__ import annotations
-import asyncio
-from datetime import timedelta
 
 import logging
 from typing import NamedTuple
+
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant, CALLBACK_TYPE
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, ServiceCall, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.exceptions import ConfigEntryNotReady, HomeAssistantError
 from homeassistant.helpers.dispatcher import (
     async_dispatcher_connect,
     async_dispatcher_send,
 )
-from .mqtt import HyperHDRInstance, HyperHDRManger
+from .mqtt import HyperHDRInstance, HyperHDRManger, adopt_probe
 
-from .const import DOMAIN
+from .const import CONF_TOPIC, DOMAIN, EVENT_CHANGE, SERVICE_PROFILE
+from .effects import effects_store
+from . import profiler
 
 _LOGGER = logging.getLogger(__name__)
 
 # For your initial PR, limit it to 1 platform.
-PLATFORMS: list[Platform] = [Platform.LIGHT, Platform.SWITCH]
+PLATFORMS: list[Platform] = [
+    Platform.LIGHT,
+    Platform.SWITCH,
+    Platform.CAMERA,
+    Platform.SENSOR,
+]
 
 
 class HyperHDRMqtt_Data(NamedTuple):
     """LocalTuya data stored in homeassistant data object."""
 
     isntances_data: dict[int, HyperHDRInstance]
+    manager: HyperHDRManger
+
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+PROFILE_SCHEMA = vol.Schema(
+    {vol.Optional("seconds", default=60): vol.All(vol.Coerce(float), vol.Range(min=1))}
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Register the integration services."""
+
+    async def profile(call: ServiceCall):
+        await profiler.async_profile(hass, call.data["seconds"])
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE, profile, PROFILE_SCHEMA)
+    return True
 
 
 async def reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
@@ -42,39 +68,69 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.info(f"Set up HyperHDR MQTT integration")
     hass.data.setdefault(DOMAIN, {})
     instances_data: dict[int, HyperHDRInstance] = {}
-
-    manager = HyperHDRManger(entry.data)
-    await manager.async_connect()
-    if manager.connected:
-        instance = manager.instances
-        for i, v in instance.items():
-            instances_data[i] = HyperHDRInstance(entry.data, i, manager)
-        manager.instances_manager = instances_data
-    else:
-        raise CannotConnect("Cannot connect MQTT Broker")
-
-    connect = [
-        asyncio.create_task(device.instance_connect())
-        for device in instances_data.values()
-    ]
-    await asyncio.wait(connect)
-
-    hass.data[DOMAIN][entry.entry_id] = HyperHDRMqtt_Data(instances_data)
+    # Options flow saves the edited settings in options.
+    config = {**entry.data, **entry.options}
+
+    # The config flow just validated this connection, take it over.
+    if (manager := adopt_probe(config)) is None:
+        manager = HyperHDRManger(config)
+        try:
+            await manager.async_connect()
+        except Exception as ex:
+            # Don't leave the handler on the shared connection, HA retries.
+            manager.disconnect()
+            raise ConfigEntryNotReady(
+                f"Cannot connect to HyperHDR {manager._topic}: {ex!r}"
+            ) from ex
+    if not manager.connected:
+        manager.disconnect()
+        raise ConfigEntryNotReady("Cannot connect MQTT Broker")
+    await manager.effects.async_load(hass, manager._topic)
+    instance = manager.instances
+    for i, v in instance.items():
+        instances_data[i] = dev = HyperHDRInstance(config, i, manager)
+        dev.change_callback = change_event(hass, dev)
+    manager.instances_manager = instances_data
+
+    # Sync all the instances in one batch, the supervisor retries the ones
+    # that didn't answer.
+    await manager.resync()
+    manager.start_heartbeat()
+
+    hass.data[DOMAIN][entry.entry_id] = HyperHDRMqtt_Data(instances_data, manager)
     # await hass.config_entries.async_forward_entry_setups(entry, Platform.LIGHT)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     # Reload entry when its updated
     entry.async_on_unload(entry.add_update_listener(reload_entry))
-    reconnectTask(hass, entry)
     return True
 
 
+def change_event(hass: HomeAssistant, device: HyperHDRInstance):
+    """Fire `EVENT_CHANGE` for the changes of the device."""
+
+    def fire(field, old, new):
+        hass.bus.async_fire(
+            EVENT_CHANGE,
+            {
+                "topic": device._topic,
+                "instance": device.selected_instance,
+                "field": field,
+                "old": old,
+                "new": new,
+            },
+        )
+
+    return fire
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     data: HyperHDRMqtt_Data = hass.data[DOMAIN][entry.entry_id]
     for i, dev in data.isntances_data.items():
         dev.disconnect()
-        dev.manager.disconnect()
+    data.manager.disconnect()
+    await data.manager.effects.async_save()
 
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
@@ -82,22 +138,10 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
-def reconnectTask(hass: HomeAssistant, entry: ConfigEntry):
-    """Add a task to reconnect to the devices if is not connected [interval: RECONNECT_INTERVAL]"""
-    data: HyperHDRMqtt_Data = hass.data[DOMAIN][entry.entry_id]
-
-    async def _async_reconnect(now):
-        """Try connecting to devices not already connected to."""
-        tasks = []
-        for instance, dev in data.isntances_data.items():
-            if not dev.connected:
-                tasks.append(asyncio.create_task(dev.instance_connect()))
-                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-
-    # Add unsub callbeack in unsub_listeners object.
-    entry.async_on_unload(
-        async_track_time_interval(hass, _async_reconnect, timedelta(seconds=5))
-    )
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the saved effect catalog of a deleted entry."""
+    topic = {**entry.data, **entry.options}[CONF_TOPIC]
+    await effects_store(hass, topic).async_remove()
 
 
 class HyperHDR_MQTT_Entity(Entity):
@@ -127,8 +171,11 @@ class HyperHDR_MQTT_Entity(Entity):
             async_dispatcher_connect(self.hass, signal, self.device_update)
         )
 
+    @callback
     def device_update(self):
-        self.schedule_update_ha_state()
+        # On the loop, so the span covers the state write itself.
+        with profiler.span("write"):
+            self.async_write_ha_state()
 
     @property
     def available(self) -> bool:
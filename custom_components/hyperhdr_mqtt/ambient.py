@@ -0,0 +1,116 @@
+"""Ambient colors computed from the HyperHDR LED stream."""
+
+from __future__ import annotations
+
+import numpy as np
+
+ZONES = ("top", "bottom", "left", "right")
+# mean, dominant, then one row per zone.
+ROWS = ("mean", "dominant", *ZONES)
+
+SMOOTHING = 0.35
+CHANGE_THRESHOLD = 6.0
+# 3 bits per channel for the dominant color histogram.
+QUANT_SHIFT = 5
+QUANT_BINS = 1 << (3 * (8 - QUANT_SHIFT))
+BIN_FACTORS = np.array(
+    [1 << (2 * (8 - QUANT_SHIFT)), 1 << (8 - QUANT_SHIFT), 1], dtype=np.intp
+)
+
+
+def zone_weights(centers: np.ndarray, count: int) -> np.ndarray:
+    """Build the (1 + zones, count) matrix averaging the LEDs of each zone.
+
+    Every LED goes to the screen edge closest to its (x, y) center, without a
+    layout all zones fall back to the overall mean.
+    """
+    weights = np.zeros((1 + len(ZONES), count), dtype=np.float32)
+    if not count:
+        return weights
+    weights[0] = 1
+    if len(centers) == count:
+        cx, cy = centers[:, 0], centers[:, 1]
+        edge = np.argmin(np.stack((cy, 1 - cy, cx, 1 - cx)), axis=0)
+        for zone in range(len(ZONES)):
+            weights[1 + zone] = edge == zone
+    else:
+        weights[1:] = 1
+
+    sums = weights.sum(axis=1, keepdims=True)
+    np.divide(weights, sums, out=weights, where=sums > 0)
+    return weights
+
+
+def to_hex(rgb) -> str:
+    return "#{:02x}{:02x}{:02x}".format(*rgb)
+
+
+class AmbientColors:
+    """Smoothed mean, dominant and per zone colors of the LED frames.
+
+    `process` runs for every frame and only reports a change when one of the
+    smoothed colors moved by more than `threshold` on any channel.
+    """
+
+    def __init__(self, smoothing=SMOOTHING, threshold=CHANGE_THRESHOLD) -> None:
+        self.smoothing = smoothing
+        self.threshold = threshold
+        self.colors: dict[str, tuple[int, int, int]] = {}
+
+        self._centers = np.zeros((0, 2))
+        self._count = -1
+        self._state = np.zeros((len(ROWS), 3), dtype=np.float32)
+        self._raw = np.zeros_like(self._state)
+        self._published = np.zeros_like(self._state)
+        self._initialized = False
+        self._alloc(0)
+
+    def _alloc(self, count: int):
+        self._count = count
+        self._weights = zone_weights(self._centers, count)
+        self._frame_f = np.zeros((count, 3), dtype=np.float32)
+        self._quant = np.zeros((count, 3), dtype=np.intp)
+        self._bins = np.zeros(count, dtype=np.intp)
+
+    def set_centers(self, centers: np.ndarray):
+        """Use the LED centers of `LedStream.centers` for the zones."""
+        if centers is not self._centers:
+            self._centers = centers
+            self._count = -1
+
+    def process(self, frame: np.ndarray) -> bool:
+        """Feed a (leds, 3) uint8 frame, return True when the colors changed."""
+        count = len(frame)
+        if not count:
+            return False
+        if count != self._count:
+            self._alloc(count)
+
+        raw = self._raw
+        np.copyto(self._frame_f, frame)
+        zones = np.matmul(self._weights, self._frame_f)
+        raw[0] = zones[0]
+        raw[2:] = zones[1:]
+
+        # Dominant color: most populated histogram bin, ignoring near black LEDs.
+        np.right_shift(frame, QUANT_SHIFT, out=self._quant)
+        np.dot(self._quant, BIN_FACTORS, out=self._bins)
+        counts = np.bincount(self._bins, minlength=QUANT_BINS)
+        if counts[0] < count:
+            counts[0] = 0
+        members = self._bins == counts.argmax()
+        raw[1] = self._frame_f[members].mean(axis=0)
+
+        if not self._initialized:
+            self._state[:] = raw
+            self._initialized = True
+        else:
+            self._state += self.smoothing * (raw - self._state)
+
+        if self.colors and np.abs(self._state - self._published).max() < self.threshold:
+            return False
+
+        self._published[:] = self._state
+        rounded = np.rint(self._state).astype(np.uint8).tolist()
+        self.colors = {row: tuple(rgb) for row, rgb in zip(ROWS, rounded)}
+        return True
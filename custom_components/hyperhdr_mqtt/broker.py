@@ -0,0 +1,354 @@
+"""Shared MQTT broker connections for HyperHDR servers.
+
+All servers reached through the same broker share one client and one
+`+/JsonAPI/response` subscription, incoming messages are routed to the
+server handler by their topic prefix.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+import hashlib
+import logging
+from typing import Callable
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from homeassistant.const import (
+    CONF_USERNAME,
+    CONF_PASSWORD,
+    CONF_PORT,
+)
+
+from .const import (
+    CONF_BROKER,
+    CONF_CERTIFICATE,
+    CONF_CLIENT_CERT,
+    CONF_CLIENT_KEY,
+    CONF_PROTOCOL,
+    CONF_SESSION,
+    CONF_TLS,
+    CONF_TLS_INSECURE,
+    JSON_API,
+    JSON_API_RESPONSE,
+    PROTOCOL_5,
+    PROTOCOL_311,
+    SESSION_CLEAN,
+    SESSION_PERSISTENT,
+)
+from .supervisor import ConnectionSupervisor
+from .tls import ResumingSSLContext, async_get_ssl_context
+
+_LOGGER = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 10
+# Unused connections stay open a moment, the next setup or probe reuses them.
+IDLE_CLOSE = 30
+# CONNACK codes for bad credentials and not authorized, MQTT 3.1.1 then 5.
+AUTH_REFUSED = (4, 5, 134, 135)
+# How long the broker keeps a persistent MQTT 5 session (seconds).
+SESSION_EXPIRY = 3600
+COMMAND_SUFFIX = "/" + JSON_API
+RESPONSE_SUFFIX = "/" + JSON_API_RESPONSE
+RESPONSE_WILDCARD = "+" + RESPONSE_SUFFIX
+COMMAND_WILDCARD = "+" + COMMAND_SUFFIX
+
+MessageHandler = Callable[[bytes], None]
+Sniffer = Callable[[str, bytes], None]
+
+CONNECTIONS: dict[tuple, BrokerConnection] = {}
+
+
+class ConnectionRefused(Exception):
+    """The broker answered the CONNECT with an error code."""
+
+    def __init__(self, rc: int) -> None:
+        if rc < 128:
+            super().__init__(mqtt.connack_string(rc))
+        else:
+            super().__init__(f"Connection Refused: reason code {rc}.")
+        self.rc = rc
+
+    @property
+    def auth(self) -> bool:
+        return self.rc in AUTH_REFUSED
+
+
+def broker_key(config: dict) -> tuple:
+    return (
+        config.get(CONF_BROKER),
+        int(config.get(CONF_PORT, 1883)),
+        config.get(CONF_USERNAME),
+        config.get(CONF_PASSWORD),
+        config.get(CONF_SESSION, SESSION_CLEAN),
+        config.get(CONF_PROTOCOL, PROTOCOL_311),
+        bool(config.get(CONF_TLS)),
+        config.get(CONF_CERTIFICATE) or None,
+        config.get(CONF_CLIENT_CERT) or None,
+        config.get(CONF_CLIENT_KEY) or None,
+        bool(config.get(CONF_TLS_INSECURE)),
+    )
+
+
+def client_id(key: tuple) -> str:
+    """Stable per broker connection, a persistent session is found after restarts."""
+    # Every client of the broker can see the id, leave the password out.
+    digest = hashlib.sha1(repr(key[:3] + key[4:]).encode()).hexdigest()[:12]
+    return f"HA-hyperhdr-{digest}"
+
+
+async def async_get_connection(config: dict) -> BrokerConnection:
+    """Return the connected shared connection for the broker in `config`."""
+    key = broker_key(config)
+    if (connection := CONNECTIONS.get(key)) is None:
+        connection = CONNECTIONS[key] = BrokerConnection(key, config)
+    try:
+        await connection.async_connect()
+    except Exception:
+        if not connection.handlers:
+            connection.close()
+        raise
+    return connection
+
+
+class BrokerConnection:
+    """One MQTT client demultiplexing the responses of many HyperHDR servers."""
+
+    def __init__(self, key: tuple, config: dict) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.key = key
+        self.client = None
+        self.handlers: dict[str, list[MessageHandler]] = {}
+
+        self._host, self._port, self._user, self._password = key[:4]
+        self._client_id = client_id(key)
+        self._persistent = config.get(CONF_SESSION) == SESSION_PERSISTENT
+        self._protocol = config.get(CONF_PROTOCOL, PROTOCOL_311)
+        self._tls = bool(config.get(CONF_TLS))
+        self._tls_insecure = bool(config.get(CONF_TLS_INSECURE))
+        self._tls_files = (
+            config.get(CONF_CERTIFICATE) or None,
+            config.get(CONF_CLIENT_CERT) or None,
+            config.get(CONF_CLIENT_KEY) or None,
+        )
+        self._ssl_context: ResumingSSLContext | None = None
+        # Persistent sessions use QoS 1 so the broker queues our responses.
+        self.qos = 1 if self._persistent else 0
+        self._subscriptions: set[str] = {RESPONSE_WILDCARD}
+        self._sniffers: list[Sniffer] = []
+        self._connected = asyncio.Event()
+        self._refused: int | None = None
+        self._lock = asyncio.Lock()
+        self._idle_handle: asyncio.TimerHandle | None = None
+        self.closed = False
+        self.supervisor = ConnectionSupervisor(self.loop, self._reconnect)
+
+    def debug(self, message):
+        _LOGGER.debug(f"{self._host}:{self._port}: {message}")
+
+    async def async_connect(self):
+        async with self._lock:
+            if self.is_connected:
+                return
+            self.debug("Connecting")
+            self._connected.clear()
+            self._refused = None
+
+            # Reuse the client so paho keeps its in-flight QoS 1 messages.
+            if (_client := self.client) is None:
+                if self._tls:
+                    self._ssl_context = await async_get_ssl_context(
+                        self._host, *self._tls_files, self._tls_insecure
+                    )
+                _client = self.client = self._create_client()
+                connect = self._connect_args(_client)
+            else:
+                _client.loop_stop()
+                connect = _client.reconnect
+
+            await self.loop.run_in_executor(None, connect)
+            _client.loop_start()
+            await asyncio.wait_for(self._connected.wait(), CONNECT_TIMEOUT)
+            if self._refused is not None:
+                raise ConnectionRefused(self._refused)
+
+    def _create_client(self) -> mqtt.Client:
+        kwargs = {}
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            kwargs["callback_api_version"] = mqtt.CallbackAPIVersion.VERSION1
+        if self._protocol == PROTOCOL_5:
+            kwargs["protocol"] = mqtt.MQTTv5
+        else:
+            kwargs["protocol"] = mqtt.MQTTv311
+            kwargs["clean_session"] = not self._persistent
+
+        _client = mqtt.Client(
+            client_id=self._client_id, reconnect_on_failure=False, **kwargs
+        )
+        if self._user and self._password:
+            _client.username_pw_set(username=self._user, password=str(self._password))
+        if self._ssl_context:
+            _client.tls_set_context(self._ssl_context)
+            if self._tls_insecure:
+                _client.tls_insecure_set(True)
+        _client.on_message = self.onMessage
+        _client.on_connect = self.onConnect
+        _client.on_disconnect = self.onDisconnect
+        return _client
+
+    def _connect_args(self, _client: mqtt.Client):
+        """Return the first connect call for the configured session mode."""
+        if self._protocol != PROTOCOL_5:
+            return partial(_client.connect, self._host, self._port)
+
+        properties = None
+        if self._persistent:
+            properties = Properties(PacketTypes.CONNECT)
+            properties.SessionExpiryInterval = SESSION_EXPIRY
+        return partial(
+            _client.connect,
+            self._host,
+            self._port,
+            clean_start=not self._persistent,
+            properties=properties,
+        )
+
+    async def _reconnect(self) -> bool:
+        await self.async_connect()
+        return True
+
+    def register(self, topic: str, handler: MessageHandler):
+        """Route the responses of `topic` to `handler`."""
+        self._cancel_idle()
+        self.handlers.setdefault(topic, []).append(handler)
+        # Only single level topics are covered by the wildcard.
+        if "/" in topic:
+            self.subscribe(topic + RESPONSE_SUFFIX)
+
+    def unregister(self, topic: str, handler: MessageHandler):
+        if handler in (handlers := self.handlers.get(topic, [])):
+            handlers.remove(handler)
+        if not handlers:
+            self.handlers.pop(topic, None)
+            if "/" in topic:
+                self.unsubscribe(topic + RESPONSE_SUFFIX)
+        self._release()
+
+    def _release(self):
+        """Close the connection once nothing used it for a while."""
+        if self.handlers or self._sniffers or self._idle_handle or self.closed:
+            return
+        self._idle_handle = self.loop.call_later(IDLE_CLOSE, self._close_idle)
+
+    def _close_idle(self):
+        self._idle_handle = None
+        if not self.handlers and not self._sniffers:
+            self.close()
+
+    def _cancel_idle(self):
+        if self._idle_handle:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def add_sniffer(self, sniffer: Sniffer) -> Callable:
+        """Receive the messages of every topic without a handler, used by discovery."""
+        self._cancel_idle()
+        self._sniffers.append(sniffer)
+        self.subscribe(COMMAND_WILDCARD)
+
+        def remove_sniffer():
+            self._sniffers.remove(sniffer)
+            if not self._sniffers:
+                self.unsubscribe(COMMAND_WILDCARD)
+            self._release()
+
+        return remove_sniffer
+
+    def subscribe(self, topic: str):
+        if topic in self._subscriptions:
+            return
+        self._subscriptions.add(topic)
+        if self.is_connected:
+            self.client.subscribe(topic, self.qos)
+
+    def unsubscribe(self, topic: str):
+        if topic in self._subscriptions:
+            self._subscriptions.discard(topic)
+            if self.is_connected:
+                self.client.unsubscribe(topic)
+
+    def publish(self, topic: str, payload: str):
+        self.client.publish(topic, payload, self.qos)
+
+    def onMessage(self, _client, userdata, msg):
+        # Called from the paho thread, handle messages in the event loop.
+        self.loop.call_soon_threadsafe(self._dispatch, msg.topic, msg.payload)
+
+    def _dispatch(self, topic: str, payload: bytes):
+        if topic.endswith(RESPONSE_SUFFIX):
+            if handlers := self.handlers.get(topic[: -len(RESPONSE_SUFFIX)]):
+                for handler in handlers:
+                    handler(payload)
+                return
+        for sniffer in self._sniffers:
+            sniffer(topic, payload)
+
+    def onConnect(self, _client, userdata, flags, rc, properties=None):
+        if rc != 0:
+            # Wake up the connect attempt now instead of waiting for the timeout.
+            # MQTT 5 passes a reason code object.
+            rc = int(getattr(rc, "value", rc))
+            self.debug(f"Connection refused: {ConnectionRefused(rc)}")
+            self.loop.call_soon_threadsafe(self._on_refused, rc)
+            return
+        if self._ssl_context:
+            self._ssl_context.save_session(_client.socket())
+        resumed = self._persistent and bool(flags.get("session present"))
+        self.loop.call_soon_threadsafe(self._on_connected, resumed)
+
+    def _on_refused(self, rc: int):
+        self._refused = rc
+        self._connected.set()
+
+    def _on_connected(self, resumed=False):
+        if self.client is None:
+            return
+        # On the loop, `subscribe` and `unsubscribe` change the set there.
+        if resumed:
+            # The broker kept our subscriptions and queued messages, just reattach.
+            self.debug("Resumed persistent session")
+        else:
+            self.client.subscribe([(topic, self.qos) for topic in self._subscriptions])
+            self.debug(f"Connected and subscribed to {self._subscriptions}")
+        self._connected.set()
+        self.supervisor.broker_connected(resumed)
+
+    def onDisconnect(self, _client, userdata, rc, properties=None):
+        self.debug(f"Disconnected ({rc})")
+        if _client is self.client and not self.closed:
+            self.loop.call_soon_threadsafe(self._on_disconnected)
+
+    def _on_disconnected(self):
+        self._connected.clear()
+        if not self.closed:
+            self.supervisor.broker_disconnected()
+
+    def close(self):
+        """Disconnect and forget the connection."""
+        self.closed = True
+        self._cancel_idle()
+        self.supervisor.shutdown()
+        if CONNECTIONS.get(self.key) is self:
+            CONNECTIONS.pop(self.key)
+        if self.client:
+            self.debug("Disconnecting")
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.client = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client is not None and self.client.is_connected()
@@ -0,0 +1,51 @@
+from . import HyperHDR_MQTT_Entity, HyperHDRMqtt_Data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.components.camera import Camera
+import logging
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+PREVIEW_FRAME_INTERVAL = 0.2
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities,
+) -> None:
+    """Setup the LED preview cameras for HyperHDR MQTT."""
+    data: HyperHDRMqtt_Data = hass.data[DOMAIN][entry.entry_id]
+    for i, api in data.isntances_data.items():
+        async_add_entities([HyperHDRPreviewCamera(hass, api)])
+
+
+class HyperHDRPreviewCamera(HyperHDR_MQTT_Entity, Camera):
+    """Live preview of the LED colors, the stream only runs while someone watches."""
+
+    _attr_frame_interval = PREVIEW_FRAME_INTERVAL
+
+    def __init__(self, hass, device) -> None:
+        HyperHDR_MQTT_Entity.__init__(self, hass, device)
+        Camera.__init__(self)
+        self._instance = self.device.selected_instance
+
+    @property
+    def name(self):
+        return "Preview"
+
+    @property
+    def is_streaming(self) -> bool:
+        return self.device.stream.running
+
+    async def async_camera_image(
+        self, width: int | None = None, height: int | None = None
+    ) -> bytes | None:
+        """Return the latest LED frame as JPEG."""
+        stream = self.device.stream
+        await stream.touch()
+        if stream.frame_id == 0:
+            return None
+        return await stream.render()
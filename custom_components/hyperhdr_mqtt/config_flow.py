@@ -14,17 +14,47 @@ from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import selector
 
-from .mqtt import HyperHDRManger
-from .const import DOMAIN, CONF_TOPIC, CONF_BROKER, CONF_PRIORITY
+from .broker import ConnectionRefused
+from .mqtt import DEFAULT_TOPIC, HyperHDRManger, async_discover_servers, park_probe
+from .const import (
+    DOMAIN,
+    CONF_TOPIC,
+    CONF_BROKER,
+    CONF_PRIORITY,
+    CONF_TRANSITION_FPS,
+    CONF_RATE_LIMIT,
+    CONF_RATE_BURST,
+    CONF_SESSION,
+    CONF_PROTOCOL,
+    CONF_TLS,
+    CONF_CERTIFICATE,
+    CONF_CLIENT_CERT,
+    CONF_CLIENT_KEY,
+    CONF_TLS_INSECURE,
+    SESSION_CLEAN,
+    SESSION_PERSISTENT,
+    PROTOCOL_311,
+    PROTOCOL_5,
+)
+from .limiter import DEFAULT_BURST, DEFAULT_RATE
+from .transition import DEFAULT_TRANSITION_FPS
 
 
 from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD, CONF_PORT
 
 _LOGGER = logging.getLogger(__name__)
 
+SESSION_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[SESSION_CLEAN, SESSION_PERSISTENT], translation_key=CONF_SESSION
+    )
+)
+PROTOCOL_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(options=[PROTOCOL_311, PROTOCOL_5])
+)
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
-        vol.Required(CONF_TOPIC, default="HyperHDR"): str,
         vol.Required(CONF_BROKER): str,
         vol.Required(CONF_PORT, default=1883): int,
         vol.Required(CONF_USERNAME): str,
@@ -34,6 +64,30 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
                 min=1, max=253, mode=selector.NumberSelectorMode.BOX
             )
         ),
+        vol.Optional(
+            CONF_TRANSITION_FPS, default=DEFAULT_TRANSITION_FPS
+        ): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=1, max=30, mode=selector.NumberSelectorMode.BOX
+            )
+        ),
+        vol.Optional(CONF_RATE_LIMIT, default=DEFAULT_RATE): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=1, max=100, mode=selector.NumberSelectorMode.BOX
+            )
+        ),
+        vol.Optional(CONF_RATE_BURST, default=DEFAULT_BURST): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=1, max=200, mode=selector.NumberSelectorMode.BOX
+            )
+        ),
+        vol.Optional(CONF_SESSION, default=SESSION_CLEAN): SESSION_SELECTOR,
+        vol.Optional(CONF_PROTOCOL, default=PROTOCOL_311): PROTOCOL_SELECTOR,
+        vol.Optional(CONF_TLS, default=False): bool,
+        vol.Optional(CONF_CERTIFICATE): str,
+        vol.Optional(CONF_CLIENT_CERT): str,
+        vol.Optional(CONF_CLIENT_KEY): str,
+        vol.Optional(CONF_TLS_INSECURE, default=False): bool,
     }
 )
 
@@ -63,25 +117,24 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
         raise ValueError("Topic without /JsonAPI")
 
     client = HyperHDRManger(data)
-    await client.async_connect()
-
-    if not client.connected:
-        raise InvalidAuth
-
     try:
-        info = await client.serverInfo()
-    except asyncio.TimeoutError:
-        raise ValueError(
-            "Cannot get server info from hyperhdr, make sure HyperHDR Is configured and connected to the same MQTT Broker."
-        )
-    if type(info) is dict:
-        sucess = info.get("success")
-        if not sucess:
+        await client.async_connect()
+        if not client.instances:
             raise ValueError(
                 "No responses from HypherHDR, make sure MQTT is connected in HyperHDR and works!"
             )
+    except Exception as ex:
+        client.disconnect()
+        if isinstance(ex, ConnectionRefused):
+            raise (InvalidAuth if ex.auth else CannotConnect) from ex
+        if isinstance(ex, asyncio.TimeoutError):
+            raise ValueError(
+                "Cannot get server info from hyperhdr, make sure HyperHDR Is configured and connected to the same MQTT Broker."
+            ) from ex
+        raise
 
-    client.disconnect()
+    # Setting up the entry reuses this connection instead of connecting again.
+    park_probe(client)
 
     return True
 
@@ -97,13 +150,44 @@ class HyperHDRMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Get options flow for this handler."""
         return HyperHDRMQTTOptionsFlow(config_entry)
 
+    def __init__(self) -> None:
+        self._data: dict[str, Any] = {}
+        self._discovered: dict[str, str] = {}
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle the initial step."""
         errors: dict[str, str] = {}
+        if user_input is not None:
+            configured = {
+                entry.data.get(CONF_TOPIC) for entry in self._async_current_entries()
+            }
+            try:
+                self._discovered = await async_discover_servers(user_input, configured)
+            except ConnectionRefused as ex:
+                errors["base"] = "invalid_auth" if ex.auth else "cannot_connect"
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.debug("Discovery failed", exc_info=True)
+                errors["base"] = "cannot_connect"
+            else:
+                self._data = user_input
+                return await self.async_step_topic()
+
+        return self.async_show_form(
+            step_id="user",
+            data_schema=STEP_USER_DATA_SCHEMA,
+            errors=errors,
+        )
+
+    async def async_step_topic(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Pick one of the discovered servers or type the topic."""
+        errors: dict[str, str] = {}
         placeholders = {}
         if user_input is not None:
+            user_input = {**self._data, **user_input}
             await self.check_uniqueID(user_input)
             try:
                 info = await validate_input(self.hass, user_input)
@@ -122,9 +206,26 @@ class HyperHDRMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     title=user_input[CONF_TOPIC], data=user_input
                 )
 
+        options = [
+            selector.SelectOptionDict(value=topic, label=label)
+            for topic, label in self._discovered.items()
+        ]
+        default = next(iter(self._discovered), DEFAULT_TOPIC)
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_TOPIC, default=default): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=options,
+                        custom_value=True,
+                        mode=selector.SelectSelectorMode.DROPDOWN,
+                    )
+                ),
+            }
+        )
+        placeholders["found"] = str(len(self._discovered))
         return self.async_show_form(
-            step_id="user",
-            data_schema=STEP_USER_DATA_SCHEMA,
+            step_id="topic",
+            data_schema=schema,
             description_placeholders=placeholders,
             errors=errors,
         )
@@ -141,6 +242,7 @@ class HyperHDRMQTTOptionsFlow(config_entries.OptionsFlow):
     def __init__(self, config_entry: config_entries.ConfigEntry):
         """Initialize HyperHDR MQTT options flow."""
         self.config_entry = config_entry
+        self.config = {**config_entry.data, **config_entry.options}
         self._topic = config_entry.data.get(CONF_TOPIC)
 
     async def async_step_init(
@@ -170,23 +272,69 @@ class HyperHDRMQTTOptionsFlow(config_entries.OptionsFlow):
 
         schema = vol.Schema(
             {
+                vol.Required(CONF_BROKER, default=self.config[CONF_BROKER]): str,
+                vol.Required(CONF_PORT, default=self.config[CONF_PORT]): int,
+                vol.Required(CONF_USERNAME, default=self.config[CONF_USERNAME]): str,
+                vol.Optional(CONF_PASSWORD, default=self.config[CONF_PASSWORD]): str,
                 vol.Required(
-                    CONF_BROKER, default=self.config_entry.data[CONF_BROKER]
-                ): str,
-                vol.Required(CONF_PORT, default=self.config_entry.data[CONF_PORT]): int,
-                vol.Required(
-                    CONF_USERNAME, default=self.config_entry.data[CONF_USERNAME]
-                ): str,
-                vol.Optional(
-                    CONF_PASSWORD, default=self.config_entry.data[CONF_PASSWORD]
-                ): str,
-                vol.Required(
-                    CONF_PRIORITY, default=self.config_entry.data[CONF_PRIORITY]
+                    CONF_PRIORITY, default=self.config[CONF_PRIORITY]
                 ): selector.NumberSelector(
                     selector.NumberSelectorConfig(
                         min=1, max=253, mode=selector.NumberSelectorMode.BOX
                     )
                 ),
+                vol.Optional(
+                    CONF_TRANSITION_FPS,
+                    default=self.config.get(
+                        CONF_TRANSITION_FPS, DEFAULT_TRANSITION_FPS
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=30, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Optional(
+                    CONF_RATE_LIMIT,
+                    default=self.config.get(CONF_RATE_LIMIT, DEFAULT_RATE),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=100, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Optional(
+                    CONF_RATE_BURST,
+                    default=self.config.get(CONF_RATE_BURST, DEFAULT_BURST),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=200, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Optional(
+                    CONF_SESSION, default=self.config.get(CONF_SESSION, SESSION_CLEAN)
+                ): SESSION_SELECTOR,
+                vol.Optional(
+                    CONF_PROTOCOL, default=self.config.get(CONF_PROTOCOL, PROTOCOL_311)
+                ): PROTOCOL_SELECTOR,
+                vol.Optional(CONF_TLS, default=self.config.get(CONF_TLS, False)): bool,
+                # Cleared fields must replace the value of the entry data.
+                vol.Optional(
+                    CONF_CERTIFICATE,
+                    default="",
+                    description={"suggested_value": self.config.get(CONF_CERTIFICATE)},
+                ): str,
+                vol.Optional(
+                    CONF_CLIENT_CERT,
+                    default="",
+                    description={"suggested_value": self.config.get(CONF_CLIENT_CERT)},
+                ): str,
+                vol.Optional(
+                    CONF_CLIENT_KEY,
+                    default="",
+                    description={"suggested_value": self.config.get(CONF_CLIENT_KEY)},
+                ): str,
+                vol.Optional(
+                    CONF_TLS_INSECURE, default=self.config.get(CONF_TLS_INSECURE, False)
+                ): bool,
             }
         )
         return self.async_show_form(
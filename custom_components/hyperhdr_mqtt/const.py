@@ -16,6 +16,21 @@ CONF_USERNAME = "command"
 CONF_PASSWORD = "serverinfo"
 CONF_BROKER = "broker"
 CONF_PRIORITY = "priority"
+CONF_TRANSITION_FPS = "transition_fps"
+CONF_RATE_LIMIT = "rate_limit"
+CONF_RATE_BURST = "rate_burst"
+CONF_SESSION = "session"
+CONF_PROTOCOL = "protocol"
+CONF_TLS = "tls"
+CONF_CERTIFICATE = "certificate"
+CONF_CLIENT_CERT = "client_cert"
+CONF_CLIENT_KEY = "client_key"
+CONF_TLS_INSECURE = "tls_insecure"
+
+SESSION_CLEAN = "clean"
+SESSION_PERSISTENT = "persistent"
+PROTOCOL_311 = "3.1.1"
+PROTOCOL_5 = "5"
 
 
 # HyperHDR
@@ -23,6 +38,11 @@ JSON_API = "JsonAPI"
 JSON_API_RESPONSE = "JsonAPI/response"
 FRIENDLY_NAME = CONF_FRIENDLY_NAME
 
+SERVICE_PROFILE = "profile"
+
+# Fired for every field that changed between two serverinfo snapshots.
+EVENT_CHANGE = "hyperhdr_mqtt_change"
+
 
 # COMMANDS
 class Data(StrEnum):
@@ -48,6 +68,18 @@ class Path(StrEnum):
     RUNNING = "running"
     CURRENTINSTANCE = "currentInstance"
     EFFECTS = "effects"
+    LEDS = "leds"
+    PRIORITIES = "priorities"
+
+
+class Change(StrEnum):
+    """Fields of `EVENT_CHANGE`, components use their own name."""
+
+    BRIGHTNESS = "brightness"
+    COLOR = "color"
+    EFFECT = "effect"
+    RUNNING = "running"
+    SOURCE = "source"
 
 
 class Errors(StrEnum):
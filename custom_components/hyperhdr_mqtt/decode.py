@@ -0,0 +1,85 @@
+"""Decoding of the JSON API responses.
+
+orjson (shipped with Home Assistant) parses the raw bytes directly, without
+the str copy `json.loads(msg.decode())` makes. Payloads above
+`EXECUTOR_THRESHOLD` (a serverinfo of a server with big effect libraries
+and LED layouts) are decoded in the executor so they never stall the loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import json
+import logging
+from typing import Any, Callable
+
+from . import profiler
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_LOGGER = logging.getLogger(__name__)
+
+EXECUTOR_THRESHOLD = 64 * 1024
+
+
+def decode(msg: bytes) -> Any:
+    with profiler.span("decode"):
+        if orjson is not None:
+            return orjson.loads(msg)
+        return json.loads(msg)
+
+
+class Decoder:
+    """Decode messages in order, the large ones off the event loop.
+
+    Messages received while a large one is decoded wait for it, so the
+    handler always sees them in the order they arrived.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        handler: Callable[[Any], None],
+        threshold: int = EXECUTOR_THRESHOLD,
+    ) -> None:
+        self.loop = loop
+        self.handler = handler
+        self.threshold = threshold
+        self._queue: deque[bytes] = deque()
+        self._busy = False
+        self._closed = False
+
+    def feed(self, msg: bytes):
+        if self._busy:
+            self._queue.append(msg)
+        elif len(msg) >= self.threshold:
+            self._decode_in_executor(msg)
+        else:
+            self.handler(decode(msg))
+
+    def _decode_in_executor(self, msg: bytes):
+        self._busy = True
+        future = self.loop.run_in_executor(None, decode, msg)
+        future.add_done_callback(self._decoded)
+
+    def _decoded(self, future: asyncio.Future):
+        self._busy = False
+        if self._closed or future.cancelled():
+            return
+        try:
+            if (ex := future.exception()) is not None:
+                _LOGGER.debug(f"Couldn't decode a large message: {ex}")
+            else:
+                self.handler(future.result())
+        finally:
+            # Drain what arrived meanwhile, until the next large message.
+            while self._queue and not self._busy:
+                self.feed(self._queue.popleft())
+
+    def close(self):
+        self._closed = True
+        self._queue.clear()
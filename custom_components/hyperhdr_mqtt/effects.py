@@ -0,0 +1,119 @@
+"""Effect catalog shared by the instances of a HyperHDR server."""
+
+from __future__ import annotations
+
+from enum import StrEnum
+import hashlib
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import DOMAIN, Data
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+MUSIC_PREFIX = "Music:"
+
+
+class EffectCategory(StrEnum):
+    CLASSIC = "classic"
+    MUSIC = "music"
+    CUSTOM = "custom"
+
+
+def effects_version(effects: list[dict]) -> str:
+    """Hash of the effect names, stable across restarts."""
+    names = "\n".join(effect.get(Data.NAME, "") for effect in effects)
+    return hashlib.sha1(names.encode()).hexdigest()
+
+
+def effect_category(effect: dict) -> EffectCategory:
+    if effect.get(Data.NAME, "").startswith(MUSIC_PREFIX):
+        return EffectCategory.MUSIC
+    # Built-in effects are bundled in the resources, custom ones are files.
+    if (file := effect.get("file")) and not file.startswith(":"):
+        return EffectCategory.CUSTOM
+    return EffectCategory.CLASSIC
+
+
+def effects_store(hass: HomeAssistant, topic: str) -> Store:
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.effects.{slugify(topic)}")
+
+
+class EffectCatalog:
+    """Sorted effect names of a server, rebuilt only when its list changes.
+
+    With a store attached the catalog is saved, so the effect list is known
+    before the first serverinfo after a restart.
+    """
+
+    def __init__(self) -> None:
+        self.version: str | None = None
+        self.names: list[str] = []
+        self._lookup: dict[str, str] = {}
+        self._category: dict[str, EffectCategory] = {}
+        self._store: Store | None = None
+        self._unsaved = False
+
+    async def async_load(self, hass: HomeAssistant, topic: str):
+        self._store = effects_store(hass, topic)
+        if self.version is not None or not (data := await self._store.async_load()):
+            return
+        self.version = data.get("version")
+        self._build(
+            (name, EffectCategory(category))
+            for name, category in data.get("effects", [])
+        )
+
+    def update(self, effects: list[dict]) -> bool:
+        """Refresh from serverinfo `effects`, returns True if the list changed."""
+        version = effects_version(effects)
+        if version == self.version:
+            return False
+        self.version = version
+        self._build(
+            (effect[Data.NAME], effect_category(effect))
+            for effect in effects
+            if effect.get(Data.NAME)
+        )
+        _LOGGER.debug(f"Effect catalog updated, {len(self.names)} effects")
+        if self._store:
+            self._unsaved = True
+            self._store.async_delay_save(self._data, SAVE_DELAY)
+        return True
+
+    async def async_save(self):
+        """Write a pending delayed save now, nothing runs after the unload."""
+        if self._store and self._unsaved:
+            await self._store.async_save(self._data())
+
+    def _build(self, effects):
+        categories = {category: [] for category in EffectCategory}
+        self._category = {}
+        for name, category in effects:
+            categories[category].append(name)
+            self._category[name] = category
+        for names in categories.values():
+            names.sort(key=str.casefold)
+
+        self.names = (
+            categories[EffectCategory.CLASSIC]
+            + categories[EffectCategory.MUSIC]
+            + categories[EffectCategory.CUSTOM]
+        )
+        self._lookup = {name.casefold(): name for name in self.names}
+
+    def _data(self) -> dict:
+        self._unsaved = False
+        return {
+            "version": self.version,
+            "effects": [[name, self._category[name]] for name in self.names],
+        }
+
+    def lookup(self, name: str) -> str | None:
+        """Return the exact effect name, matching case insensitive."""
+        return self._lookup.get(name.casefold())
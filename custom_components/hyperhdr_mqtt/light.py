@@ -8,6 +8,7 @@ from homeassistant.components.light import (
     ATTR_COLOR_TEMP,
     ATTR_EFFECT,
     ATTR_HS_COLOR,
+    ATTR_TRANSITION,
     DOMAIN,
     LightEntityFeature,
     ColorMode,
@@ -92,6 +93,7 @@ class HyperHDRLight(HyperHDR_MQTT_Entity, LightEntity):
         """Flag supported features."""
         supports = LightEntityFeature(0)
         supports |= LightEntityFeature.EFFECT
+        supports |= LightEntityFeature.TRANSITION
         return supports
 
     @property
@@ -105,13 +107,34 @@ class HyperHDRLight(HyperHDR_MQTT_Entity, LightEntity):
         return self.device.active_effect
 
     async def async_turn_on(self, **kwargs):
+        transition = kwargs.get(ATTR_TRANSITION)
+        fade = transition and (
+            kwargs.get(ATTR_BRIGHTNESS) is not None or kwargs.get(ATTR_HS_COLOR)
+        )
+        # The brightness a cancelled fade out didn't restore yet.
+        restore = self.device.transitions.take_restore()
+        # A new fade retargets the running one from the last values it sent.
+        if not fade:
+            self.device.transitions.cancel()
         commands = []
         on_payload = await self.device.set_component(Components.LEDDEVICE, True, True)
         commands.append(on_payload)
+        if not (fade and kwargs.get(ATTR_BRIGHTNESS) is not None):
+            commands.extend(restore)
 
         if effect := kwargs.get(ATTR_EFFECT):
+            effect = self.device.manager.effects.lookup(effect) or effect
             commands.append(await self.device.set_color_efect(effect, True))
 
+        if fade:
+            brightness = kwargs.get(ATTR_BRIGHTNESS)
+            hs_color = kwargs.get(ATTR_HS_COLOR)
+            await self.device.publish(commands)
+            if brightness is not None:
+                brightness = map_range(brightness, 0, 255, 0, 100)
+            await self.device.transitions.start(transition, brightness, hs_color)
+            return
+
         if hs_color := kwargs.get(ATTR_HS_COLOR):
             rgb_color = color_util.color_hs_to_RGB(*hs_color)
             commands.append(await self.device.set_color(rgb_color, True))
@@ -126,4 +149,29 @@ class HyperHDRLight(HyperHDR_MQTT_Entity, LightEntity):
         await self.device.publish(commands, True)
 
     async def async_turn_off(self, **kwargs):
+        if (transition := kwargs.get(ATTR_TRANSITION)) and self.device.brightness:
+            # Fade out, then restore the brightness once the LEDs are off.
+            restore = self.device.transitions.take_restore() or [
+                await self.device.set_adjustment(
+                    Adjustments.BRIGHTNESS, self.device.brightness, True
+                )
+            ]
+            final = [await self.device.set_component(Components.LEDDEVICE, False, True)]
+            if self.device.owns_priority:
+                final.insert(0, await self.device.clear_piority(True))
+            await self.device.transitions.start(
+                transition, 0, final=final, restore=restore
+            )
+            return
+
+        if restore := self.device.transitions.cancel():
+            # Cut a fade out short, with the brightness it would have restored.
+            commands = [
+                await self.device.set_component(Components.LEDDEVICE, False, True),
+                *restore,
+            ]
+            if self.device.owns_priority:
+                commands.insert(0, await self.device.clear_piority(True))
+            await self.device.publish(commands, True)
+            return
         await self.device.set_component(Components.LEDDEVICE, False)
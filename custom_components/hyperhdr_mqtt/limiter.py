@@ -0,0 +1,103 @@
+"""Rate limiting of what is published to a HyperHDR server.
+
+A single HyperHDR process serves all its instances, every poll, fast sync
+and command of them shares one token bucket. Commands wait for a token in
+order, background polls are only sent while the bucket has more than the
+share kept for the commands, otherwise they are skipped until the next one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from enum import IntEnum
+
+DEFAULT_RATE = 20
+DEFAULT_BURST = 40
+# Part of the bucket the polls leave for the commands.
+POLL_RESERVE = 0.25
+# Commands waiting for a token, more are rejected.
+MAX_DEFERRED = 50
+
+
+class Priority(IntEnum):
+    COMMAND = 0
+    POLL = 1
+
+
+class RateLimiter:
+    """Token bucket of `rate` messages per second with `burst` tokens."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.rate = max(1.0, float(rate))
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = self.loop.time()
+        self._waiters: deque[asyncio.Future] = deque()
+        self._wakeup: asyncio.TimerHandle | None = None
+        # Polls skipped and commands dropped / commands that had to wait.
+        self.rejected = 0
+        self.deferred = 0
+
+    def _refill(self):
+        now = self.loop.time()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: Priority = Priority.COMMAND) -> bool:
+        """Returns False if the message must not be sent."""
+        self._refill()
+        if priority == Priority.POLL:
+            # Shed first, never ahead of a waiting command.
+            if self._waiters or self._tokens < 1 + self.burst * POLL_RESERVE:
+                self.rejected += 1
+                return False
+            self._tokens -= 1
+            return True
+
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        if len(self._waiters) >= MAX_DEFERRED:
+            self.rejected += 1
+            return False
+
+        self.deferred += 1
+        waiter = self.loop.create_future()
+        self._waiters.append(waiter)
+        self._schedule()
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if not waiter.cancelled():
+                # Got a token while being cancelled, give it back.
+                self._tokens += 1
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _schedule(self):
+        if self._wakeup is None and self._waiters:
+            delay = max(0.0, (1 - self._tokens) / self.rate)
+            self._wakeup = self.loop.call_later(delay, self._release)
+
+    def _release(self):
+        self._wakeup = None
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._tokens -= 1
+            waiter.set_result(True)
+        self._schedule()
+
+    def close(self):
+        if self._wakeup:
+            self._wakeup.cancel()
+            self._wakeup = None
+        # Nothing is sent anymore, the waiting commands are dropped.
+        while self._waiters:
+            if not (waiter := self._waiters.popleft()).done():
+                waiter.set_result(False)
@@ -1,20 +1,14 @@
 """HANDLE MQTT FOR HyperHDR."""
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
 from enum import StrEnum
 import ssl
 import time
-from typing import Any, Self
-from homeassistant.components.mqtt import (
-    async_subscribe_connection_status,
-    is_connected as mqtt_connected,
-)
+from typing import Self
 import asyncio
 import logging
 import json
 
-from homeassistant.components.mqtt import client
 from homeassistant.const import (
     CONF_HOST,
     CONF_USERNAME,
@@ -22,6 +16,7 @@ from homeassistant.const import (
     CONF_PORT,
 )
 from .const import (
+    Change,
     Components,
     Data,
     Errors,
@@ -29,26 +24,76 @@ from .const import (
     JSON_API,
     JSON_API_RESPONSE,
     CONF_PRIORITY,
+    CONF_TRANSITION_FPS,
+    CONF_RATE_LIMIT,
+    CONF_RATE_BURST,
+    CONF_SESSION,
+    SESSION_CLEAN,
     Path,
     Adjustments,
 )
+from .supervisor import ConnectionSupervisor
+from .broker import (
+    COMMAND_SUFFIX,
+    RESPONSE_SUFFIX,
+    BrokerConnection,
+    async_get_connection,
+    broker_key,
+)
+from .stream import (
+    CMD_LEDSTREAM_START,
+    CMD_LEDSTREAM_STOP,
+    LEDSTREAM_UPDATE,
+    LedStream,
+)
+from .transition import DEFAULT_TRANSITION_FPS, TransitionScheduler
+from .effects import EffectCatalog
+from .decode import Decoder, decode
+from .limiter import DEFAULT_BURST, DEFAULT_RATE, Priority, RateLimiter
+from .pending import PendingCommands
+from .performance import Performance
+from . import profiler
 
 # from .const import(JSON_API,JSON_API_RESPONSE,PATH_INSTANCE,[Path.INFO], PATH_COMPONENTS, PATH_RUNNING)
-INSTANCE_OFF = "Instance is OFF"
 
 CONF_BROKER = "broker"
 CONF_TOPIC = "topic"
-CONF_CLIENT_ID = "client_id"
 
 COMMAND = "command"
 SERVERINFO = "serverinfo"
 PIORITY = 1
 
-STATES_UPDATE_INTERVAL = 2
+# Full serverinfo sync, commands still trigger a fast sync.
+STATES_UPDATE_INTERVAL = 15
+FAST_UPDATE_INTERVAL = 0.45
+# Fast polls after a command before giving up on seeing it change the states.
+FAST_UPDATE_POLLS = 10
+RESYNC_TIMEOUT = 5
+# How long the setup waits for the instances list of the server.
+SERVERINFO_TIMEOUT = 10
+
+# Liveness check, instances go unavailable after HEARTBEAT_MISSES misses.
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 2
+HEARTBEAT_MISSES = 3
+# Heartbeat commands are tagged with tan >= HEARTBEAT_TAN, switchTo uses
+# HEARTBEAT_TAN + 1 + instance.
+HEARTBEAT_TAN = 1000
+SYSINFO = "sysinfo"
+SWITCH_TO = "instance-switchTo"
+
+# Validated managers wait this long for the setup of their entry.
+PROBE_TTL = 60
+
+DEFAULT_TOPIC = "HyperHDR"
+DISCOVERY_LISTEN_TIME = 2
+DISCOVERY_PROBE_TIMEOUT = 3
 
 CMD_UPDATEINFO = {COMMAND: SERVERINFO}
 _LOGGER = logging.getLogger(__name__)
 
+PROBES: dict[tuple, tuple["HyperHDRManger", asyncio.TimerHandle]] = {}
+
 
 def change_index(instance):
     select_index = {
@@ -64,14 +109,112 @@ def dumps_payload(payload):
     return str(payload).replace("'", '"').replace('"{', "{").replace('}"', "}")
 
 
+async def async_discover_servers(config: dict, ignore=()) -> dict[str, str]:
+    """Find the HyperHDR servers on the broker, returns {topic: label}.
+
+    Topics seen on the wildcard subscriptions are collected for a moment, then
+    every candidate is probed with `serverinfo`.
+    """
+    # Always a clean session, a persistent setup never reuses this connection.
+    connection = await async_get_connection({**config, CONF_SESSION: SESSION_CLEAN})
+    candidates = {DEFAULT_TOPIC}
+    found: dict[str, str] = {}
+
+    def sniffer(topic: str, payload: bytes):
+        if topic.endswith(RESPONSE_SUFFIX):
+            prefix = topic[: -len(RESPONSE_SUFFIX)]
+        elif topic.endswith(COMMAND_SUFFIX):
+            candidates.add(topic[: -len(COMMAND_SUFFIX)])
+            return
+        else:
+            return
+        candidates.add(prefix)
+        try:
+            responses = decode(payload)
+        except ValueError:
+            return
+        if isinstance(responses, dict):
+            responses = [responses]
+        for response in responses:
+            if isinstance(response, dict) and response.get(COMMAND) == SERVERINFO:
+                info = response.get(Path.INFO) or {}
+                name = info.get("hostname") or prefix
+                found[prefix] = (
+                    f"{prefix} ({name}, {len(info.get(Path.INSTANCE, []))} instances)"
+                )
+
+    remove_sniffer = connection.add_sniffer(sniffer)
+    try:
+        await asyncio.sleep(DISCOVERY_LISTEN_TIME)
+        for topic in candidates - set(found) - set(ignore):
+            _LOGGER.debug(f"Probing {topic}")
+            connection.publish(
+                topic + COMMAND_SUFFIX, json.dumps([change_index(0), CMD_UPDATEINFO])
+            )
+        await asyncio.sleep(DISCOVERY_PROBE_TIMEOUT)
+    finally:
+        remove_sniffer()
+
+    return {topic: label for topic, label in found.items() if topic not in ignore}
+
+
+def probe_key(config: dict) -> tuple:
+    return (config.get(CONF_TOPIC), *broker_key(config))
+
+
+def park_probe(manager: "HyperHDRManger"):
+    """Keep a validated manager for the setup that follows the config flow."""
+    key = probe_key(manager._config)
+    if parked := PROBES.pop(key, None):
+        parked[1].cancel()
+        parked[0].disconnect()
+
+    def expire():
+        if PROBES.get(key, (None,))[0] is manager:
+            PROBES.pop(key)
+            manager.debug("Probe expired")
+            manager.disconnect()
+
+    PROBES[key] = (manager, manager.loop.call_later(PROBE_TTL, expire))
+
+
+def adopt_probe(config: dict) -> "HyperHDRManger | None":
+    """Return the parked manager validated with the same settings, if any."""
+    if (parked := PROBES.pop(probe_key(config), None)) is None:
+        return None
+    manager, expiry = parked
+    expiry.cancel()
+    if not manager.is_connected:
+        manager.disconnect()
+        return None
+    manager.debug("Adopted the config flow connection")
+    manager._config = config
+    manager._priority = int(config.get(CONF_PRIORITY))
+    manager.limiter = rate_limiter(config)
+    return manager
+
+
+def rate_limiter(config: dict) -> RateLimiter:
+    return RateLimiter(
+        config.get(CONF_RATE_LIMIT, DEFAULT_RATE),
+        config.get(CONF_RATE_BURST, DEFAULT_BURST),
+    )
+
+
 class HyperHDRManger:
     def __init__(self, config: dict) -> None:
         self.loop = asyncio.get_running_loop()
-        self._payload: dict = None
-        self.instances: dict = {}
+        self._serverinfo_received = asyncio.Event()
+        # {instance: {friendly_name, running}}, updated in place.
+        self.instances: dict[int, dict] = {}
         self.instances_manager: dict[int, HyperHDRInstance] = {}
 
+        self.connection: BrokerConnection = None
+        self.connected = False
+        self._unsub_recover = None
+
         # User config
+        self._config = config
         self._topic = config.get(CONF_TOPIC)
         self._topic_push = self._topic + "/" + JSON_API
         self._host = config.get(CONF_BROKER)
@@ -80,8 +223,20 @@ class HyperHDRManger:
         self._password = config.get(CONF_PASSWORD)
         self._priority = int(config.get(CONF_PRIORITY))
 
-        # Commands Responses.
-        self._serverInfo: dict = {}
+        # HyperHDR streams the LEDs of a single instance per session.
+        self._stream_owner: int | None = None
+        # All instances of the server share the same effects.
+        self.effects = EffectCatalog()
+        self._decoder = Decoder(self.loop, self._handle)
+        # Everything published through `publish`, heartbeats and resyncs
+        # are a single message per server and skip it.
+        self.limiter = rate_limiter(config)
+        # Commands of every instance waiting for it to be reachable again.
+        self.pending: dict[int, PendingCommands] = {}
+
+        self._heartbeat_task: asyncio.Task = None
+        self._heartbeat_answer: asyncio.Event = asyncio.Event()
+        self._heartbeat_running: dict[int, bool] = {}
 
     def debug(self, message):
         _LOGGER.debug(f"{self._topic}: {message}")
@@ -89,125 +244,238 @@ class HyperHDRManger:
     async def async_connect(self):
         self.debug(f"Connecting to {self._host}:{self._port}")
 
-        _client = client.MqttClientSetup(
-            {
-                CONF_CLIENT_ID: f"HA-{self._topic}",
-                CONF_TOPIC: self._topic,
-                CONF_BROKER: self._host,
-                CONF_PORT: self._port,
-                CONF_USERNAME: self._user,
-                CONF_PASSWORD: self._password,
-            }
-        ).client
-        if self._user and self._password:
-            _client.username_pw_set(username=self._user, password=str(self._password))
-
-        _client.connect(self._host, self._port)
-        _client.loop()
-        _client.loop_start()
-        _client.on_message = self.onMessage
-        _client.on_connect = self.onConnect
-        _client.on_disconnect = self.onDisconnect
-
-        self.client = _client
-        self.connected = _client.is_connected()
-        self.subscribes()
+        self.connection = await async_get_connection(self._config)
+        self.connection.register(self._topic, self.onMessage)
+        self._unsub_recover = self.supervisor.on_recover(self.recover)
+        self.connected = self.connection.is_connected
         await self.serverInfo()
 
         if not self.connected:
             raise Exception("Couldn't connect.")
 
-    async def serverInfo(self, instance=0) -> dict:
-        async def getserverInfo():
+    def start_heartbeat(self):
+        """Check the liveness of the server and its instances periodically."""
+
+        async def heartbeat_loop():
             while True:
-                payload = CMD_UPDATEINFO
-                await self.publish(instance, payload, wait=True)
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+                if self.is_connected and self.instances_manager:
+                    await self.heartbeat()
 
-                if self._serverInfo != None:
-                    break
+        if self._heartbeat_task is None:
+            self._heartbeat_task = self.loop.create_task(
+                heartbeat_loop(), name=f"hyperhdr_mqtt_heartbeat_{self._topic}"
+            )
+
+    async def heartbeat(self):
+        """Send `sysinfo` and a switchTo per instance in one tiny publish."""
+        payload = [
+            {**change_index(i), "tan": HEARTBEAT_TAN + 1 + i}
+            for i in self.instances_manager
+        ]
+        payload.append({COMMAND: SYSINFO, "tan": HEARTBEAT_TAN})
+        self._heartbeat_running = {}
+        self._heartbeat_answer.clear()
+        self.connection.publish(self._topic_push, json.dumps(payload))
+
+        try:
+            await asyncio.wait_for(self._heartbeat_answer.wait(), HEARTBEAT_TIMEOUT)
+            answered = True
+        except asyncio.TimeoutError:
+            answered = False
+
+        for i, dev in self.instances_manager.items():
+            dev.heartbeat(answered, self._heartbeat_running.get(i))
+
+    def _on_heartbeat(self, response: dict):
+        tan = response.get("tan")
+        if tan == HEARTBEAT_TAN:
+            self._heartbeat_answer.set()
+        elif response.get(COMMAND) == SWITCH_TO:
+            self._heartbeat_running[tan - HEARTBEAT_TAN - 1] = bool(
+                response.get("success")
+            )
+
+    async def serverInfo(self, instance=0):
+        """Request serverinfo and wait for the instances list."""
+        self._serverinfo_received.clear()
+        await self.publish(instance, CMD_UPDATEINFO)
+        await asyncio.wait_for(self._serverinfo_received.wait(), SERVERINFO_TIMEOUT)
 
-        await asyncio.wait_for(getserverInfo(), 10)
+    def onMessage(self, msg: bytes):
+        self._decoder.feed(msg)
+
+    def _handle(self, payload) -> dict:
+        if isinstance(payload, dict) and payload.get(COMMAND) == LEDSTREAM_UPDATE:
+            if owner := self.instances_manager.get(self._stream_owner):
+                with profiler.span("frame"):
+                    owner.stream.on_frame(payload["result"]["leds"])
+            return
 
-    def subscribes(self) -> bool:
-        if self.connected:
-            topic = self._topic + "/" + JSON_API_RESPONSE
-            self.client.subscribe(topic)
-            self.debug(f"Subscribed to {topic} successfully")
-            return True
+        responses = payload if isinstance(payload, list) else [payload]
+        heartbeat = [
+            r
+            for r in responses
+            if isinstance(r, dict) and r.get("tan", 0) >= HEARTBEAT_TAN
+        ]
+        for response in heartbeat:
+            self._on_heartbeat(response)
+        if len(heartbeat) == len(responses):
+            return
 
-    def onMessage(self, _client, userdata, msg) -> dict:
-        payload = json.loads(msg.payload.decode())
-        self._payload = payload.copy()
         if isinstance(payload, dict) and (result := payload.get("success")):
             return result
         if "success" in payload:
             return
 
         for cmd_response in payload:
-            success, error = cmd_response.get("success"), cmd_response.get("error")
+            error = cmd_response.get("error")
             command = cmd_response.get(COMMAND)
             if command == SERVERINFO:
                 if error == Errors.NOT_READY:
                     # The instance is stopped
-                    main_info = self._serverInfo[Path.INFO]
-                    for instance_info in main_info[Path.INSTANCE]:
-                        instance = instance_info.get(Path.INSTANCE)
-                        if not main_info[Path.INSTANCE][instance][Path.RUNNING]:
-                            if i_manager := self.instances_manager.get(instance):
-                                i_manager._serverInfo = INSTANCE_OFF
-                    return
+                    for i, instance_info in self.instances.items():
+                        if not instance_info.get(Path.RUNNING):
+                            if i_manager := self.instances_manager.get(i):
+                                i_manager.instance_off()
+                    continue
 
                 info = cmd_response[Path.INFO]
-                i = info.get(Path.CURRENTINSTANCE, None)
-                if i == 0:
-                    self._serverInfo = cmd_response
-
-                if i in self.instances_manager:
-                    self.instances_manager[i]._serverInfo = cmd_response
-
-                # Update instance.
-                self.instances = {i[Path.INSTANCE]: i for i in info[Path.INSTANCE]}
+                self._update_instances(info[Path.INSTANCE])
+                self._serverinfo_received.set()
 
-    def onConnect(self, _client, userdata, flags, rc):
-        self.debug(f"Has been connected successfully")
+                i = info.get(Path.CURRENTINSTANCE, None)
+                if i_manager := self.instances_manager.get(i):
+                    with profiler.span("states"):
+                        i_manager.update_states(info)
+
+    def _update_instances(self, instances: list[dict]):
+        """Keep only the name and running flag of every instance."""
+        for item in instances:
+            i = item[Path.INSTANCE]
+            if (known := self.instances.get(i)) is None:
+                known = self.instances[i] = {}
+            known[FRIENDLY_NAME] = item.get(FRIENDLY_NAME)
+            running = item.get(Path.RUNNING)
+            if known.get(Path.RUNNING) != running:
+                known[Path.RUNNING] = running
+                # Any instance reports all of them, the stopped one can't.
+                if dev := self.instances_manager.get(i):
+                    dev._check_running()
+                    dev._update()
+
+    async def recover(self, resumed: bool):
+        """The broker connection is back."""
+        if not resumed:
+            await self.resync()
+            return
+        # Nothing was lost, restart polling where it stopped.
+        for dev in self.instances_manager.values():
+            if dev.connected:
+                await dev.synced()
+
+    async def resync(self):
+        """Request the serverinfo of every instance in one publish."""
+        devices = list(self.instances_manager.values())
+        if not devices or not self.is_connected:
+            return
+        payload = []
+        for dev in devices:
+            dev._answered.clear()
+            payload += [change_index(dev.selected_instance), CMD_UPDATEINFO]
+        self.debug(f"Resync {len(devices)} instances")
+        self.connection.publish(self._topic_push, json.dumps(payload))
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(dev._answered.wait() for dev in devices)),
+                RESYNC_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            pass
 
-    def onDisconnect(self, _client, userdata, rc):
-        self.disconnect()
+        for dev in devices:
+            synced = dev._answered.is_set()
+            self.supervisor.set_connected(dev._key, synced)
+            if synced:
+                await dev.synced()
 
     def disconnect(self):
         self.debug(f"Disconnecting from {self._host}:{self._port} and clean subs")
-        self.client.unsubscribe(self._topic)
-        self.client.disconnect()
-        self.client.loop_stop()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._unsub_recover:
+            self._unsub_recover()
+            self._unsub_recover = None
+        self._decoder.close()
+        self.limiter.close()
+        self.pending.clear()
+        if self.connection:
+            self.connection.unregister(self._topic, self.onMessage)
         self.connected = None
 
-    async def publish(self, instance, msg: dict, wait=False) -> bool:
+    async def publish(
+        self, instance, msg: dict, priority=Priority.COMMAND, keep=True
+    ) -> bool:
+        """Returns False if nothing was published.
+
+        With `keep` the commands are kept until the instance is back when it
+        or the broker is unreachable.
+        """
         if isinstance(msg, list):
             payload = [change_index(instance)] + msg
         else:
             payload = [change_index(instance), msg]
-        if self.connected:
-            self._payload = None
-
-            # Change selected index.
-            async def publish_and_wait():
-                self.client.publish(self._topic_push, dumps_payload(payload))
-                while True:
-                    await asyncio.sleep(0.2)
-                    if self._payload is not None:
-                        break
-
-            # We will wait for any message for the next 3 seconds else we will return
-            self.debug(f"Publishing: {dumps_payload(payload)}")
-            task = asyncio.create_task(publish_and_wait())
-            if wait:
-                await asyncio.wait_for(task, 5)
-        else:
+        dev = self.instances_manager.get(instance)
+        if keep and (not self.is_connected or (dev is not None and not dev.connected)):
+            if priority == Priority.COMMAND and self.pending.setdefault(
+                instance, PendingCommands(self.loop)
+            ).add(payload[1:]):
+                self.debug(f"Keeping {payload[1:]} until instance {instance} is back")
+                return False
+        if not self.is_connected:
             self.debug(f"Couldn't publish {payload} because broker isn't connected.")
+            return False
+        if not await self.limiter.acquire(priority) or not self.is_connected:
+            if priority != Priority.POLL:
+                self.debug(f"Dropped {payload}, the server is busy.")
+            return False
+
+        self.debug(f"Publishing: {dumps_payload(payload)}")
+        self.connection.publish(self._topic_push, dumps_payload(payload))
+        return True
+
+    async def send_pending(self, instance) -> bool:
+        """Publish the commands kept while the instance was away in one batch."""
+        if (pending := self.pending.pop(instance, None)) is None:
+            return False
+        if not (commands := pending.take()):
+            return False
+        self.debug(f"Sending {len(commands)} commands kept for instance {instance}")
+        return await self.publish(instance, commands, keep=False)
+
+    async def stream_start(self, instance):
+        """Start the LED stream of the instance, replacing any other stream."""
+        if self._stream_owner not in (None, instance):
+            if owner := self.instances_manager.get(self._stream_owner):
+                owner.stream.running = False
+        self._stream_owner = instance
+        await self.publish(instance, json.dumps(CMD_LEDSTREAM_START))
+
+    async def stream_stop(self, instance):
+        if self._stream_owner != instance:
+            return
+        self._stream_owner = None
+        await self.publish(instance, json.dumps(CMD_LEDSTREAM_STOP))
+
+    @property
+    def supervisor(self) -> ConnectionSupervisor:
+        return self.connection.supervisor
 
     @property
     def is_connected(self) -> bool:
-        return self.client and self.client.is_connected()
+        return self.connection is not None and self.connection.is_connected
 
 
 class HyperHDRInstance:
@@ -220,8 +488,8 @@ class HyperHDRInstance:
     ) -> None:
         self.loop = asyncio.get_running_loop()
 
-        self.components = ComponentsStates({})
-        self._cache_components: dict = {}
+        self.states = InstanceState()
+        self._answered = asyncio.Event()
         self._states_updater_task: asyncio.Task = None
 
         # Mqtt preapre configs.
@@ -229,16 +497,28 @@ class HyperHDRInstance:
         self._topic_push = self._topic + "/" + JSON_API
         self._priority = config.get(CONF_PRIORITY)
         self.manager = manager
-        self.connected = False
+        self._key = (self._topic, instance)
+        manager.supervisor.add(self._key, self.instance_connect, self.synced)
 
         self.time_last_publish = time.time()
         self._wait_for_new_states = False
+        self._fast_polls = 0
+        self._poll_now = asyncio.Event()
+        self._poll_task: asyncio.Task = None
+        self._synced_task: asyncio.Task = None
+        self._missed_beats = 0
         self.selected_instance: int = instance
         self.update_callback = None
-        self.light_effects = []
-        self.active_effect = ""
-        self.rgb_value = ()
-        self.brightness = None
+        # Only the performance sensors listen to the performance values.
+        self.performance_callback = None
+        # Called with (field, old, new) for every change between two syncs.
+        self.change_callback = None
+        self._running = None
+        self.stream = LedStream(self)
+        self.transitions = TransitionScheduler(
+            self, config.get(CONF_TRANSITION_FPS, DEFAULT_TRANSITION_FPS)
+        )
+        self.polling_paused = False
 
     def debug(self, message):
         _LOGGER.debug(f"{self._topic} Instance: {self.selected_instance}: {message}")
@@ -246,103 +526,142 @@ class HyperHDRInstance:
     def warning(self, message):
         _LOGGER.warning(f"{self._topic} Instance: {self.selected_instance}: {message}")
 
-    async def instance_connect(self):
-        if self.manager.is_connected:
-            try:
-                await self.serverInfo(update=True)
-                self._states_updater()
-                self.connected = True
-            except asyncio.TimeoutError:
-                _LOGGER.error(
-                    f"Instance {self.selected_instance}: There is no response from HyperHDR"
-                )
+    @property
+    def connected(self) -> bool:
+        return self.manager.supervisor.is_connected(self._key)
+
+    async def instance_connect(self) -> bool:
+        """Sync the instance, the supervisor retries with backoff if it fails."""
+        if not self.manager.is_connected:
+            return False
+        if not await self.serverInfo():
+            _LOGGER.error(
+                f"Instance {self.selected_instance}: There is no response from HyperHDR"
+            )
+            return False
+        return True
 
-    async def serverInfo(self, update=False) -> dict:
-        # Payload requesting ServerINFO
-        if update:
-            self._serverInfo = None
-
-            async def getserverInfo():
-                payload = CMD_UPDATEINFO
-                await self.publish(payload)
-                while True:
-                    await asyncio.sleep(0.01)
-                    if self._serverInfo != None:
-                        break
-
-            try:
-                await asyncio.wait_for(getserverInfo(), 3)
-                if not self.connected:
-                    self.connected = True
-            except asyncio.TimeoutError:
-                self.disconnect()
-                await self.fetch_states(INSTANCE_OFF)
-            await self.fetch_states(self._serverInfo)
+    async def synced(self):
+        """The instance answered, start polling its states."""
+        self._states_updater()
+        if await self.manager.send_pending(self.selected_instance):
+            self.sync_soon()
+        if self.stream.watched:
+            await self.stream.start()
+
+    async def serverInfo(self, priority=Priority.COMMAND) -> bool:
+        """Request serverinfo, the states are updated when it arrives."""
+        self._answered.clear()
+        if not await self.publish(CMD_UPDATEINFO, priority=priority):
+            return False
+        try:
+            await asyncio.wait_for(self._answered.wait(), 3)
+        except asyncio.TimeoutError:
+            # Slow sync isn't a lost instance, the heartbeat decides that.
+            self.debug("No serverinfo response, keeping the last states")
+            return False
+        return True
+
+    def instance_off(self):
+        """The instance is stopped and has no states."""
+        self.states.components.clear()
+        self._answered.set()
+        self._check_running()
+        self._update()
+
+    def update_states(self, info: dict):
+        """Update the states in place from a serverinfo `info`."""
+        states = self.states
+        # The first snapshot has nothing to compare with.
+        notify = states.synced
+        changes = []
+        states.synced = True
+        self._answered.set()
+        if self.manager.effects.update(info.get(Path.EFFECTS, [])):
+            # The effect list of every light changed.
+            for dev in self.manager.instances_manager.values():
+                dev._update()
+        if leds := info.get(Path.LEDS):
+            self.stream.set_layout(leds)
+        if states.performance.update(info) and self.performance_callback:
+            self.performance_callback()
+
+        # Update RGB Colors
+        if active_color := info.get("activeLedColor"):
+            rgb = active_color[0]["RGB Value"]
+            if not same_rgb(states.rgb, rgb):
+                rgb = tuple(rgb)
+                changes.append((Change.COLOR, states.rgb, rgb))
+                states.rgb = rgb
+        # Update Brightness
+        if adjustments := info.get("adjustment"):
+            brightness = adjustments[0]["brightness"]
+            if states.brightness != brightness:
+                changes.append((Change.BRIGHTNESS, states.brightness, brightness))
+                states.brightness = brightness
+        # Update The effect
+        if activeeffects := info.get("activeEffects"):
+            active_effect = activeeffects[0]["name"]
         else:
-            await self.fetch_states()
+            active_effect = None
+        if states.effect != active_effect:
+            changes.append((Change.EFFECT, states.effect, active_effect))
+            states.effect = active_effect
+
+        if (priorities := info.get(Path.PRIORITIES)) is not None:
+            if states.priorities.update(priorities):
+                changes.append(
+                    (
+                        Change.SOURCE,
+                        states.priorities.previous,
+                        states.priorities.visible_source,
+                    )
+                )
+
+        for com in info[Path.COMPONENTS]:
+            name, enabled = com[Data.NAME], com[Data.ENABLED]
+            old = states.components.set(name, enabled)
+            if old != enabled:
+                changes.append((name, old, enabled))
 
-        return self._serverInfo
+        if notify:
+            for change in changes:
+                self._changed(*change)
+        self._check_running()
 
-    async def fetch_states(self, payload=None):
-        # Update device INFO
-        updated = False
-        data = payload or self._serverInfo
-        if data == INSTANCE_OFF:
-            self._cache_components = {}
+        if changes:
             self._update()
-            return
 
-        if data and data.get(Path.INFO):
-            info = data[Path.INFO]
-            if not self.light_effects:
-                self._effects(info[Path.EFFECTS])
-
-            # Update RGB Colors
-            if active_color := info.get("activeLedColor"):
-                rgb_value = tuple(c for c in active_color[0]["RGB Value"])
-                if self.rgb_value != rgb_value:
-                    self.rgb_value = rgb_value
-                    updated = True
-            # Update Brightness
-            if adjustments := info.get("adjustment"):
-                brightness = adjustments[0]["brightness"]
-                if self.brightness != brightness:
-                    self.brightness = brightness
-                    updated = True
-            # Update The effect
-            if activeeffects := info.get("activeEffects"):
-                active_effect = activeeffects[0]["name"]
-            else:
-                active_effect = None
-            if self.active_effect != active_effect:
-                self.active_effect = active_effect
-                updated = True
-
-            components = {}
-            for com in info[Path.COMPONENTS]:
-                components[com[Data.NAME]] = com[Data.ENABLED]
-                if self._cache_components.get(com[Data.NAME]) != com[Data.ENABLED]:
-                    self._cache_components[com[Data.NAME]] = com[Data.ENABLED]
-                    updated = True
-
-            if components:
-                self.components = ComponentsStates(components)
-
-            if updated:
-                self._update()
-        return True
+    def _changed(self, field: str, old, new):
+        if self.change_callback:
+            self.change_callback(field, old, new)
+
+    def _check_running(self):
+        """Report the instance being started or stopped."""
+        info = self.manager.instances.get(self.selected_instance) or {}
+        running = info.get(Path.RUNNING)
+        if running is None or running == self._running:
+            return
+        if self._running is not None:
+            self._changed(Change.RUNNING, self._running, running)
+        self._running = running
 
     async def set_component(self, component: Components, state, return_payload=False):
         payload = {
             "command": "componentstate",
             "componentstate": {"component": component.value, "state": state},
         }
-        if component == Components.LEDDEVICE and state is False:
-            await self.clear_piority()
-
         if return_payload:
             return json.dumps(payload)
 
+        if component == Components.LEDDEVICE and state is False:
+            # Clear and turn off in one publish.
+            commands = [json.dumps(payload)]
+            if self.owns_priority:
+                commands.insert(0, await self.clear_piority(True))
+            await self.publish(commands, True)
+            return
+
         await self.publish(payload, True)
 
     async def set_instance(self, state):
@@ -352,8 +671,9 @@ class HyperHDRInstance:
             "subcommand": subcommand,
             "instance": self.selected_instance,
         }
-        self._wait_for_new_states = True
-        await self.manager.publish(0, payload)
+        # The serverinfo of instance 0 reports the new running state at once.
+        await self.manager.publish(0, [json.dumps(payload), json.dumps(CMD_UPDATEINFO)])
+        self.sync_soon()
 
     async def set_color_efect(self, effect, return_payload=False):
         payload = {
@@ -392,68 +712,166 @@ class HyperHDRInstance:
 
         await self.publish(payload, True)
 
-    async def clear_piority(self):
+    async def clear_piority(self, return_payload=False):
         """"""
         payload = {"command": "clear", "priority": self._priority}
+        if return_payload:
+            return json.dumps(payload)
         await self.publish(payload)
 
-    async def publish(self, payload: dict | list, wait_for_states=False):
+    async def publish(
+        self, payload: dict | list, wait_for_states=False, priority=Priority.COMMAND
+    ) -> bool:
         """Publish instance payload"""
         if wait_for_states:
-            self._wait_for_new_states = True
+            self.sync_soon()
 
-        if isinstance(payload, list):
-            await self.manager.publish(self.selected_instance, payload)
-        else:
-            await self.manager.publish(self.selected_instance, json.dumps(payload))
+        if not isinstance(payload, list):
+            payload = json.dumps(payload)
+        return await self.manager.publish(
+            self.selected_instance, payload, priority=priority
+        )
+
+    def sync_soon(self):
+        """Poll the states quickly until they change."""
+        self._wait_for_new_states = True
+        self._fast_polls = 0
+        self._poll_now.set()
+
+    def heartbeat(self, answered: bool, running: bool | None):
+        """Liveness from the manager heartbeat, the poller only syncs states."""
+        if not answered:
+            self._missed_beats += 1
+            if self._missed_beats >= HEARTBEAT_MISSES and self.connected:
+                self.warning(f"No answer to {self._missed_beats} heartbeats")
+                self.lost()
+            return
+
+        self._missed_beats = 0
+        if not self.connected:
+            # Answering again, states from the last sync are good enough until
+            # the poller refreshes them. Never synced ones wait for the supervisor.
+            if self.states.synced:
+                self.manager.supervisor.set_connected(self._key, True)
+                self._synced_task = self.loop.create_task(
+                    self.synced(), name=f"hyperhdr_mqtt_synced_{self.selected_instance}"
+                )
+                self.sync_soon()
+            return
+        info = self.manager.instances.get(self.selected_instance)
+        if running is not None and info and info.get(Path.RUNNING) != running:
+            info[Path.RUNNING] = running
+            self._check_running()
+            self.sync_soon()
+            self._update()
+
+    def lost(self):
+        """The instance stopped answering, let the supervisor reconnect it."""
+        self._stop()
+        self.manager.supervisor.set_connected(self._key, False)
+        self._update()
 
     def disconnect(self):
         self.debug(f"HyperHDR MQTT Disconnected")
-        self.connected = False
+        self._stop()
+        self.manager.supervisor.remove(self._key)
+
+    def _stop(self):
+        self.stream.close()
+        self.transitions.cancel()
         if self._states_updater_task:
             self._states_updater_task.cancel()
             self._states_updater_task = None
-
-    def _effects(self, effects: list[dict[str, str]]):
-        """Sort Effetcts"""
-        classic_effects = []
-        music_effects = []
-        for e in effects:
-            for _, value in e.items():
-                if value.startswith("Music:"):
-                    music_effects.append(value)
-                else:
-                    classic_effects.append(value)
-
-        self.light_effects = classic_effects + music_effects
+        if self._poll_task:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._synced_task:
+            self._synced_task.cancel()
+            self._synced_task = None
 
     def _states_updater(self):
         """Start the state updater to poll the states of instances"""
 
         async def start_loop():
             self.debug("Started state fetch loop")
+            # Connected again, the entities are available.
+            self._update()
 
-            while True:
+            # Just synced, the first poll waits for the interval or `sync_soon`.
+            while self.connected:
                 try:
-                    interval = STATES_UPDATE_INTERVAL
-                    asyncio.create_task(self.serverInfo(True))
-                    if self._wait_for_new_states:
-                        interval = 0.45
-                    await asyncio.sleep(interval)
+                    fast = (
+                        self._wait_for_new_states
+                        and self._fast_polls < FAST_UPDATE_POLLS
+                    )
+                    if fast:
+                        self._fast_polls += 1
+                    try:
+                        await asyncio.wait_for(
+                            self._poll_now.wait(),
+                            FAST_UPDATE_INTERVAL if fast else STATES_UPDATE_INTERVAL,
+                        )
+                    except asyncio.TimeoutError:
+                        if fast and not self._wait_for_new_states:
+                            # The new states arrived meanwhile.
+                            continue
+                    self._poll_now.clear()
+                    # Transitions own the state while fading.
+                    if self.connected and not self.polling_paused:
+                        self._poll()
                 except (Exception, asyncio.CancelledError) as ex:
                     self.debug(f"State fetch loop stopped: {ex}")
                     break
 
+            # Lost connection, `synced` starts a new loop after reconnecting.
+            if self._states_updater_task is asyncio.current_task():
+                self._states_updater_task = None
+
         if self._states_updater_task is None:
             self._states_updater_task = self.loop.create_task(
                 start_loop(), name=f"hyperhdr_mqtt_{self.selected_instance}"
             )
 
+    def _poll(self):
+        """Request the states, unless the last request is still unanswered."""
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = self.loop.create_task(
+                self.serverInfo(Priority.POLL),
+                name=f"hyperhdr_mqtt_poll_{self.selected_instance}",
+            )
+
     def _update(self):
         if self.update_callback:
-            self.update_callback()
+            with profiler.span("dispatch"):
+                self.update_callback()
             self._wait_for_new_states = False
 
+    @property
+    def components(self) -> "ComponentsStates":
+        return self.states.components
+
+    @property
+    def brightness(self) -> int | None:
+        return self.states.brightness
+
+    @property
+    def rgb_value(self) -> tuple:
+        return self.states.rgb
+
+    @property
+    def active_effect(self) -> str | None:
+        return self.states.effect
+
+    @property
+    def owns_priority(self) -> bool:
+        """Our priority is registered, or we don't know the priorities yet."""
+        priorities = self.states.priorities
+        return not priorities.known or int(self._priority) in priorities
+
+    @property
+    def light_effects(self) -> list[str]:
+        return self.manager.effects.names
+
     @property
     def name(self) -> str:
         return self.manager.instances[self.selected_instance].get(FRIENDLY_NAME)
@@ -476,21 +894,144 @@ class DeviceUpdated(ABC):
         """Device updated status."""
 
 
-@dataclass
+COMPONENTS = tuple(Components)
+COMPONENT_INDEX = {component.value: i for i, component in enumerate(COMPONENTS)}
+
+
+def same_rgb(rgb: tuple, value: list) -> bool:
+    """Compare without building a tuple of the new value."""
+    return (
+        len(rgb) == len(value) == 3
+        and rgb[0] == value[0]
+        and rgb[1] == value[1]
+        and rgb[2] == value[2]
+    )
+
+
 class ComponentsStates:
-    """Represent the components states."""
+    """Components flags indexed by `Components`, None if not reported."""
+
+    __slots__ = ("flags",)
+
+    def __init__(self) -> None:
+        self.flags: list[bool | None] = [None] * len(COMPONENTS)
+
+    def set(self, name: str, enabled: bool) -> bool | None:
+        """Set the flag, returns the old one. Unknown components are ignored."""
+        if (i := COMPONENT_INDEX.get(name)) is None:
+            return enabled
+        old, self.flags[i] = self.flags[i], enabled
+        return old
 
-    data: dict[str, Any]
+    def get(self, component: str) -> bool:
+        if (i := COMPONENT_INDEX.get(component)) is None:
+            return False
+        return bool(self.flags[i])
 
-    def __post_init__(self) -> None:
-        self.all: bool = self.data.get(Components.ALL, False)
-        self.hdr: bool = self.data.get(Components.HDR, False)
-        self.smoothing: bool = self.data.get(Components.SMOOTHING, False)
-        self.blackborder: bool = self.data.get(Components.BLACKBORDER, False)
-        self.forwarder: bool = self.data.get(Components.FORWARDER, False)
-        self.videograbber: bool = self.data.get(Components.VIDEOGRABBER, False)
-        self.systemgrabber: bool = self.data.get(Components.SYSTEMGRABBER, False)
-        self.leddevice: bool = self.data.get(Components.LEDDEVICE, False)
+    def clear(self):
+        for i in range(len(self.flags)):
+            self.flags[i] = None
 
     def as_dict(self) -> dict:
-        return self.__dict__["data"]
+        return {
+            component.value: flag
+            for component, flag in zip(COMPONENTS, self.flags)
+            if flag is not None
+        }
+
+    @property
+    def leddevice(self) -> bool:
+        return self.get(Components.LEDDEVICE)
+
+
+class PrioritySource:
+    """One registered priority of an instance."""
+
+    __slots__ = ("priority", "component", "origin", "owner", "active", "visible")
+
+    def __init__(self, priority: int) -> None:
+        self.priority = priority
+        self.component: str | None = None
+        self.origin: str | None = None
+        self.owner: str | None = None
+        self.active = False
+        self.visible = False
+
+    def update(self, entry: dict):
+        self.component = entry.get("componentId")
+        self.origin = entry.get("origin")
+        self.owner = entry.get("owner")
+        self.active = bool(entry.get("active"))
+        self.visible = bool(entry.get("visible"))
+
+
+class Priorities:
+    """Serverinfo `priorities` indexed by priority, updated in place."""
+
+    __slots__ = ("sources", "visible", "previous", "known")
+
+    def __init__(self) -> None:
+        self.sources: dict[int, PrioritySource] = {}
+        self.visible: PrioritySource | None = None
+        # visible_source before the last change.
+        self.previous: tuple | None = None
+        # False until the server reported its priorities once.
+        self.known = False
+
+    def update(self, entries: list[dict]) -> bool:
+        """Returns True if the visible source changed."""
+        self.known = True
+        old = self.visible
+        old_component = old.component if old else None
+        seen = set()
+        visible = None
+        for entry in entries:
+            if (priority := entry.get("priority")) is None:
+                continue
+            seen.add(priority)
+            if (source := self.sources.get(priority)) is None:
+                source = self.sources[priority] = PrioritySource(priority)
+            source.update(entry)
+            if source.visible:
+                visible = source
+        if len(seen) != len(self.sources):
+            for priority in self.sources.keys() - seen:
+                del self.sources[priority]
+        self.visible = visible
+        if visible is old and (old is None or old.component == old_component):
+            return False
+        self.previous = (old.priority, old_component) if old else None
+        return True
+
+    @property
+    def visible_source(self) -> tuple | None:
+        """(priority, component) of the visible source."""
+        if self.visible is None:
+            return None
+        return (self.visible.priority, self.visible.component)
+
+    def __contains__(self, priority: int) -> bool:
+        return priority in self.sources
+
+
+class InstanceState:
+    """States kept from serverinfo, updated in place on every sync."""
+
+    __slots__ = (
+        "components",
+        "priorities",
+        "performance",
+        "brightness",
+        "rgb",
+        "effect",
+        "synced",
+    )
+
+    def __init__(self) -> None:
+        self.components = ComponentsStates()
+        self.priorities = Priorities()
+        self.performance = Performance()
+        self.brightness: int | None = None
+        self.rgb: tuple = ()
+        self.effect: str | None = ""
+        self.synced = False
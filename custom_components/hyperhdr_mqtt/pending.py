@@ -0,0 +1,74 @@
+"""Commands sent while the broker or an instance is unreachable.
+
+Only the latest command of every target (a component, the color, the
+effect, an adjustment...) is kept, for `PENDING_TTL` seconds. They are
+published in one batch once the instance synced again, so short outages
+don't lose commands nor replay every retry on reconnect.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+PENDING_TTL = 30
+MAX_PENDING = 32
+
+
+def command_target(command: dict) -> tuple | None:
+    """What the command sets, None for the ones that aren't kept."""
+    name = command.get("command")
+    if name == "componentstate":
+        return (name, command["componentstate"].get("component"))
+    if name == "adjustment":
+        return (
+            name,
+            *sorted(k for k in command["adjustment"] if k != "classic_config"),
+        )
+    if name in ("color", "effect", "clear"):
+        return (name, command.get("priority"))
+    if name == "instance" and command.get("subcommand") in (
+        "startInstance",
+        "stopInstance",
+    ):
+        return (name, command.get("instance"))
+    return None
+
+
+class PendingCommands:
+    """Latest command per target, in the order they were sent."""
+
+    __slots__ = ("loop", "commands")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        # {target: (time, command)}
+        self.commands: dict[tuple, tuple[float, str]] = {}
+
+    def add(self, commands: list[str | dict]) -> bool:
+        """Keep the commands with a target, returns False if there was none."""
+        now = self.loop.time()
+        kept = False
+        for command in commands:
+            data = json.loads(command) if isinstance(command, str) else command
+            if not isinstance(data, dict) or (target := command_target(data)) is None:
+                continue
+            # Moved to the end, a newer color replaces an older effect on replay.
+            self.commands.pop(target, None)
+            self.commands[target] = (now, json.dumps(data))
+            kept = True
+        while len(self.commands) > MAX_PENDING:
+            del self.commands[next(iter(self.commands))]
+        return kept
+
+    def take(self) -> list[str]:
+        """Returns the commands that didn't expire and forgets all of them."""
+        expired = self.loop.time() - PENDING_TTL
+        commands = [
+            command for sent, command in self.commands.values() if sent >= expired
+        ]
+        self.commands.clear()
+        return commands
+
+    def __len__(self) -> int:
+        return len(self.commands)
@@ -0,0 +1,67 @@
+"""Grabber values from serverinfo.
+
+Only the `grabbers.active` list of the serverinfo is read, other sections
+differ between HyperHDR versions and aren't parsed until a real serverinfo
+of each version backs them. Values the server doesn't report are skipped.
+"""
+
+from __future__ import annotations
+
+from enum import StrEnum
+from typing import Any
+
+
+class Metric(StrEnum):
+    GRABBER_DEVICE = "grabber_device"
+
+
+def dig(data: Any, *paths: tuple) -> Any:
+    """Return the value at the first path found, lists use their first item."""
+    for path in paths:
+        value = data
+        for key in path:
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if not isinstance(value, dict):
+                value = None
+                break
+            value = value.get(key)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if value is not None and not isinstance(value, dict):
+            return value
+    return None
+
+
+def text(value: Any) -> str | None:
+    return str(value) if value not in (None, "") else None
+
+
+PARSERS = {
+    Metric.GRABBER_DEVICE: lambda info: text(dig(info, ("grabbers", "active"))),
+}
+
+
+class Performance:
+    """Latest performance values of an instance, updated in place."""
+
+    __slots__ = ("values",)
+
+    def __init__(self) -> None:
+        self.values: dict[Metric, Any] = {}
+
+    def update(self, info: dict) -> bool:
+        """Returns True if any value changed."""
+        changed = False
+        for metric, parse in PARSERS.items():
+            try:
+                value = parse(info)
+            except Exception:  # pylint: disable=broad-except
+                value = None
+            if self.values.get(metric) != value:
+                self.values[metric] = value
+                changed = True
+        return changed
+
+    def get(self, metric: Metric) -> Any:
+        return self.values.get(metric)
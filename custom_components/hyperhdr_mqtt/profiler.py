@@ -0,0 +1,146 @@
+"""Opt-in timing of the hot paths.
+
+`span(stage)` returns a shared no-op context manager until profiling is
+enabled, so the instrumented code only pays for a function call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_DIR = "hyperhdr_mqtt_profile"
+
+
+class Stage:
+    """Aggregated timings of one stage."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else 0,
+            "max_us": round(self.max * 1e6, 1),
+        }
+
+
+STAGES: dict[str, Stage] = {}
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if (stage := STAGES.get(self.stage)) is None:
+            stage = STAGES[self.stage] = Stage()
+        stage.add(elapsed)
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _noop(stage: str) -> _NoopSpan:
+    return NOOP_SPAN
+
+
+span = _noop
+
+
+def enable():
+    global span
+    STAGES.clear()
+    span = _Span
+
+
+def disable():
+    global span
+    span = _noop
+
+
+def stats() -> dict[str, dict]:
+    return {name: stage.as_dict() for name, stage in sorted(STAGES.items())}
+
+
+def _write(directory: str, profile: cProfile.Profile, stages: dict) -> str:
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, time.strftime("%Y%m%d-%H%M%S"))
+    profile.dump_stats(f"{base}.prof")
+
+    # Human readable summary limited to the integration code.
+    out = io.StringIO()
+    out.write("stage                 count   total_ms    mean_us     max_us\n")
+    for name, stage in stages.items():
+        out.write(
+            f"{name:<20} {stage['count']:>6} {stage['total_ms']:>10} "
+            f"{stage['mean_us']:>10} {stage['max_us']:>10}\n"
+        )
+    out.write("\n")
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(
+        "hyperhdr_mqtt"
+    )
+    with open(f"{base}.txt", "w", encoding="utf-8") as file:
+        file.write(out.getvalue())
+    return f"{base}.prof"
+
+
+async def async_profile(hass: HomeAssistant, seconds: float) -> str:
+    """Run cProfile and the stage spans for `seconds`, returns the stats file."""
+    if span is not _noop:
+        raise HomeAssistantError("A profile is already running")
+    profile = cProfile.Profile()
+    enable()
+    profile.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile.disable()
+        disable()
+
+    stages = stats()
+    path = await hass.async_add_executor_job(
+        _write, hass.config.path(PROFILE_DIR), profile, stages
+    )
+    _LOGGER.info(f"Profile written to {path}, stages: {stages}")
+    return path
@@ -0,0 +1,187 @@
+from . import HyperHDR_MQTT_Entity, HyperHDRMqtt_Data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+import logging
+
+from .ambient import AmbientColors, to_hex
+from .const import DOMAIN
+from .performance import Metric
+
+_LOGGER = logging.getLogger(__name__)
+
+# metric: (name, icon, unit)
+METRICS = {
+    Metric.GRABBER_DEVICE: ("Grabber device", "mdi:video-input-hdmi", None),
+}
+
+# limiter counter: (name, icon)
+LIMITER = {
+    "rejected": ("Rejected messages", "mdi:cancel"),
+    "deferred": ("Deferred commands", "mdi:timer-sand"),
+}
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities,
+) -> None:
+    """Setup the sensors platform for HyperHDR MQTT."""
+    data: HyperHDRMqtt_Data = hass.data[DOMAIN][entry.entry_id]
+    for i, api in data.isntances_data.items():
+        entities = [HyperHDRAmbientSensor(hass, api), HyperHDRSourceSensor(hass, api)]
+        if i == min(data.isntances_data):
+            # The limiter is shared by the server, shown on its first instance.
+            entities += [
+                HyperHDRLimiterSensor(hass, api, counter) for counter in LIMITER
+            ]
+        # Only what this server reports, the sections differ between versions.
+        for metric in METRICS:
+            if api.states.performance.get(metric) is not None:
+                entities.append(HyperHDRPerformanceSensor(hass, api, metric))
+        async_add_entities(entities)
+
+
+class HyperHDRAmbientSensor(HyperHDR_MQTT_Entity, SensorEntity):
+    """Dominant LED color, with mean and per zone colors as attributes.
+
+    Disabled by default because it keeps the LED stream running.
+    """
+
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:television-ambient-light"
+
+    def __init__(self, hass, device) -> None:
+        super().__init__(hass, device)
+        self._instance = self.device.selected_instance
+        self._ambient = AmbientColors()
+
+    @property
+    def name(self):
+        return "Ambient color"
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.device.stream.add_listener(self._on_frame))
+
+    def _on_frame(self, frame):
+        self._ambient.set_centers(self.device.stream.centers)
+        if self._ambient.process(frame):
+            self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> str | None:
+        if dominant := self._ambient.colors.get("dominant"):
+            return to_hex(dominant)
+        return None
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        return {row: list(rgb) for row, rgb in self._ambient.colors.items()}
+
+
+class HyperHDRSourceSensor(HyperHDR_MQTT_Entity, SensorEntity):
+    """Component of the visible priority, shows when another source overrides HA."""
+
+    _attr_icon = "mdi:import"
+
+    def __init__(self, hass, device) -> None:
+        super().__init__(hass, device)
+        self._instance = self.device.selected_instance
+
+    @property
+    def name(self):
+        return "Source"
+
+    @property
+    def native_value(self) -> str | None:
+        if visible := self.device.states.priorities.visible:
+            return visible.component
+        return None
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        priorities = self.device.states.priorities
+        visible = priorities.visible
+        return {
+            "priority": visible.priority if visible else None,
+            "origin": visible.origin if visible else None,
+            "owner": visible.owner if visible else None,
+            "home_assistant": bool(
+                visible and visible.priority == int(self.device._priority)
+            ),
+            "priorities": sorted(
+                source.priority
+                for source in priorities.sources.values()
+                if source.active
+            ),
+        }
+
+
+class HyperHDRPerformanceSensor(HyperHDR_MQTT_Entity, SensorEntity):
+    """Grabber value parsed from serverinfo.
+
+    The values have their own signal, a change doesn't rewrite every entity.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass, device, metric: Metric) -> None:
+        super().__init__(hass, device)
+        self._instance = self.device.selected_instance
+        self._metric = metric
+        name, icon, unit = METRICS[metric]
+        self._name = name
+        self._attr_icon = icon
+        self._attr_native_unit_of_measurement = unit
+        if unit:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        signal = f"hyperhdr_mqtt_{self.device._topic}_{self._instance}_performance"
+
+        def dispatch_performance():
+            async_dispatcher_send(self._hass, signal)
+
+        self.device.performance_callback = dispatch_performance
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, signal, self.device_update)
+        )
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def native_value(self):
+        return self.device.states.performance.get(self._metric)
+
+
+class HyperHDRLimiterSensor(HyperHDR_MQTT_Entity, SensorEntity):
+    """Messages the rate limiter of the server rejected or deferred."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    # The counters change without a device update.
+    _attr_should_poll = True
+
+    def __init__(self, hass, device, counter: str) -> None:
+        super().__init__(hass, device)
+        self._instance = self.device.selected_instance
+        self._counter = counter
+        self._name, self._attr_icon = LIMITER[counter]
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def native_value(self) -> int:
+        return getattr(self.device.manager.limiter, self._counter)
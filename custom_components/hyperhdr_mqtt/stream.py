@@ -0,0 +1,198 @@
+"""LED colors stream for HyperHDR instances."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+from PIL import Image
+
+if TYPE_CHECKING:
+    from .mqtt import HyperHDRInstance
+
+_LOGGER = logging.getLogger(__name__)
+
+CMD_LEDSTREAM_START = {"command": "ledcolors", "subcommand": "ledstream-start"}
+CMD_LEDSTREAM_STOP = {"command": "ledcolors", "subcommand": "ledstream-stop"}
+LEDSTREAM_UPDATE = "ledcolors-ledstream-update"
+
+# Stop the stream if no one requested an image for this long (seconds).
+STREAM_IDLE_TIMEOUT = 30
+PREVIEW_SIZE = (160, 90)
+JPEG_QUALITY = 80
+
+
+class LedStream:
+    """Keep the latest LED frame of an instance and render previews on demand."""
+
+    def __init__(self, device: HyperHDRInstance) -> None:
+        self.device = device
+        self.running = False
+        self.frame_id = 0
+
+        self._listeners: list[Callable[[np.ndarray], None]] = []
+        self._idle_handle: asyncio.TimerHandle | None = None
+        # Stream start and stop requests in flight.
+        self._tasks: set[asyncio.Task] = set()
+        # Only a hash of the layout is kept to notice changes between polls.
+        self._layout_key: tuple | None = None
+        self._centers = np.zeros((0, 2))
+
+        self._frame = np.zeros((0, 3), dtype=np.uint8)
+        self._flat = self._frame.reshape(-1)
+        # Last row of the palette stays black for pixels without LED.
+        self._palette = np.zeros((1, 3), dtype=np.uint8)
+        self._pixel_map = np.zeros(PREVIEW_SIZE[::-1], dtype=np.intp)
+        self._jpeg: bytes | None = None
+        self._jpeg_frame_id = -1
+
+    @property
+    def frame(self) -> np.ndarray:
+        """The latest LED colors as (leds, 3) uint8 array."""
+        return self._frame
+
+    @property
+    def centers(self) -> np.ndarray:
+        """(leds, 2) x, y of the LED centers, empty without a layout."""
+        return self._centers
+
+    @property
+    def watched(self) -> bool:
+        return bool(self._listeners) or self._idle_handle is not None
+
+    def set_layout(self, layout: list[dict]):
+        """Update the LED layout from serverinfo `leds`."""
+        boxes = np.array(
+            [(led["hmin"], led["hmax"], led["vmin"], led["vmax"]) for led in layout],
+            dtype=np.float64,
+        ).reshape(-1, 4)
+        key = (len(boxes), hash(boxes.tobytes()))
+        if key == self._layout_key:
+            return
+        self._layout_key = key
+        self._centers = boxes.reshape(-1, 2, 2).mean(axis=2)
+        self._resize(len(boxes), boxes)
+
+    def _resize(self, count: int, boxes: np.ndarray | None = None):
+        """Allocate the frame buffers for `count` LEDs."""
+        self._frame = np.zeros((count, 3), dtype=np.uint8)
+        self._flat = self._frame.reshape(-1)
+        self._palette = np.zeros((count + 1, 3), dtype=np.uint8)
+
+        width, height = PREVIEW_SIZE
+        pixel_map = np.full((height, width), count, dtype=np.intp)
+        if boxes is not None and len(boxes) == count:
+            for i, (hmin, hmax, vmin, vmax) in enumerate(boxes.tolist()):
+                x0, x1 = int(hmin * width), int(hmax * width)
+                y0, y1 = int(vmin * height), int(vmax * height)
+                pixel_map[y0 : max(y1, y0 + 1), x0 : max(x1, x0 + 1)] = i
+        elif count:
+            # No layout, render the LEDs as a strip.
+            pixel_map[:] = np.arange(width) * count // width
+
+        # Replaced, never changed in place, renders in flight keep the old one.
+        self._pixel_map = pixel_map
+        self._jpeg_frame_id = -1
+
+    def on_frame(self, leds: list[int]):
+        """Decode a `ledstream-update` frame into the preallocated buffer."""
+        if len(leds) != self._flat.size:
+            # The next serverinfo brings the layout for the new LED count.
+            self._layout_key = None
+            self._resize(len(leds) // 3)
+            if len(leds) != self._flat.size:
+                return
+        self._flat[:] = leds
+        self.frame_id += 1
+
+        for listener in self._listeners:
+            listener(self._frame)
+
+    async def render(self) -> bytes | None:
+        """Render the latest frame to JPEG, reusing the last one if nothing changed.
+
+        The frame is copied on the loop, only the pixels and the JPEG are done
+        in the executor, frames and layouts received meanwhile don't touch it.
+        """
+        if not self._frame.size:
+            return None
+        if self._jpeg_frame_id == self.frame_id:
+            return self._jpeg
+
+        frame_id = self.frame_id
+        self._palette[:-1] = self._frame
+        jpeg = await self.device.loop.run_in_executor(
+            None, render_jpeg, self._palette.copy(), self._pixel_map
+        )
+        if frame_id > self._jpeg_frame_id:
+            self._jpeg = jpeg
+            self._jpeg_frame_id = frame_id
+        return jpeg
+
+    async def touch(self):
+        """A viewer requested an image, keep the stream alive."""
+        if self._idle_handle:
+            self._idle_handle.cancel()
+        self._idle_handle = self.device.loop.call_later(
+            STREAM_IDLE_TIMEOUT, self._idle_timeout
+        )
+        await self.start()
+
+    def add_listener(self, listener: Callable[[np.ndarray], None]) -> Callable:
+        """Call `listener` with every frame, the stream runs while listeners exist."""
+        self._listeners.append(listener)
+        self._create_task(self.start(), "start")
+
+        def remove_listener():
+            self._listeners.remove(listener)
+            if not self.watched:
+                self._create_task(self.stop(), "stop")
+
+        return remove_listener
+
+    def _idle_timeout(self):
+        self._idle_handle = None
+        if not self.watched:
+            self._create_task(self.stop(), "stop")
+
+    def _create_task(self, coro, action: str):
+        task = self.device.loop.create_task(
+            coro, name=f"hyperhdr_mqtt_stream_{action}_{self.device.selected_instance}"
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self):
+        if self.running or not self.device.manager.is_connected:
+            return
+        self.running = True
+        self.device.debug("Starting LED stream")
+        await self.device.manager.stream_start(self.device.selected_instance)
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.device.debug("Stopping LED stream")
+        await self.device.manager.stream_stop(self.device.selected_instance)
+
+    def close(self):
+        """Forget the stream state, used when the instance disconnects."""
+        if self._idle_handle:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        for task in self._tasks:
+            task.cancel()
+        self.running = False
+
+
+def render_jpeg(palette: np.ndarray, pixel_map: np.ndarray) -> bytes:
+    """Paint the preview from a frame snapshot, runs in the executor."""
+    buffer = io.BytesIO()
+    Image.fromarray(np.take(palette, pixel_map, axis=0), "RGB").save(
+        buffer, format="JPEG", quality=JPEG_QUALITY
+    )
+    return buffer.getvalue()
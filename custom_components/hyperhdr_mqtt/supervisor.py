@@ -0,0 +1,183 @@
+"""Reconnect supervisor for the broker connection and HyperHDR instances."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Hashable
+
+_LOGGER = logging.getLogger(__name__)
+
+BACKOFF_BASE = 1
+BACKOFF_MAX = 300
+BACKOFF_JITTER = 0.3
+
+Attempt = Callable[[], Awaitable[bool]]
+Callback = Callable[[], Awaitable]
+
+
+class Backoff:
+    """Exponential backoff with jitter."""
+
+    def __init__(self, base=BACKOFF_BASE, cap=BACKOFF_MAX) -> None:
+        self.base = base
+        self.cap = cap
+        self.failures = 0
+
+    def next_delay(self) -> float:
+        delay = min(self.cap, self.base * 2**self.failures)
+        self.failures += 1
+        return delay * random.uniform(1 - BACKOFF_JITTER, 1)
+
+    def reset(self):
+        self.failures = 0
+
+
+class Target:
+    """Something kept connected by the supervisor."""
+
+    def __init__(
+        self, key: Hashable, attempt: Attempt, on_connected: Callback | None = None
+    ) -> None:
+        self.key = key
+        self.attempt = attempt
+        # Called once the target is marked connected after a successful attempt.
+        self.on_connected = on_connected
+        self.connected = False
+        # State before the broker went down, restored when a session resumes.
+        self.parked = False
+        self.backoff = Backoff()
+        self.task: asyncio.Task | None = None
+        self.handle: asyncio.TimerHandle | None = None
+
+    def cancel(self):
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+
+class ConnectionSupervisor:
+    """Own the connected state of a broker connection and the instances behind it.
+
+    Every target has at most one connect attempt in flight, failed attempts
+    are retried with exponential backoff. While the broker is down the
+    instances are parked, once it is back every registered `on_recover`
+    callback resyncs its instances in one batch. When the broker resumed a
+    persistent session the parked states are restored without a resync.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, broker_attempt: Attempt):
+        self.loop = loop
+        self.broker = Target("broker", broker_attempt)
+        self.targets: dict[Hashable, Target] = {}
+        self._recover_callbacks: list[Callable[[bool], Awaitable]] = []
+        self._recover_task: asyncio.Task | None = None
+
+    def debug(self, message):
+        _LOGGER.debug(f"Supervisor: {message}")
+
+    def add(
+        self, key: Hashable, attempt: Attempt, on_connected: Callback | None = None
+    ):
+        if key not in self.targets:
+            self.targets[key] = Target(key, attempt, on_connected)
+
+    def remove(self, key: Hashable):
+        if target := self.targets.pop(key, None):
+            target.cancel()
+
+    def on_recover(self, callback: Callable[[bool], Awaitable]) -> Callable:
+        """Call `callback(resumed)` every time the broker connection is back."""
+        self._recover_callbacks.append(callback)
+        return lambda: self._recover_callbacks.remove(callback)
+
+    def is_connected(self, key: Hashable) -> bool:
+        target = self.targets.get(key)
+        return self.broker.connected and target is not None and target.connected
+
+    def set_connected(self, key: Hashable, connected: bool):
+        """Update the state of a target, schedule a reconnect if it was lost."""
+        if (target := self.targets.get(key)) is None:
+            return
+        target.connected = connected
+        if connected:
+            target.backoff.reset()
+            target.cancel()
+        elif self.broker.connected:
+            self._schedule(target)
+
+    def broker_connected(self, resumed=False):
+        self.debug(f"Broker connected (resumed: {resumed})")
+        self.broker.connected = True
+        self.broker.backoff.reset()
+        # Keep the attempt task, it is the one waiting for this connection.
+        if self.broker.handle:
+            self.broker.handle.cancel()
+            self.broker.handle = None
+        if resumed:
+            for target in self.targets.values():
+                target.connected = target.parked
+        if self._recover_callbacks and self._recover_task is None:
+            self._recover_task = self.loop.create_task(
+                self._recover(resumed), name="hyperhdr_mqtt_recover"
+            )
+
+    def broker_disconnected(self):
+        self.debug("Broker disconnected")
+        self.broker.connected = False
+        for target in self.targets.values():
+            target.parked = target.connected
+            target.connected = False
+            target.cancel()
+        self._schedule(self.broker)
+
+    async def _recover(self, resumed: bool):
+        try:
+            await asyncio.gather(
+                *(callback(resumed) for callback in self._recover_callbacks),
+                return_exceptions=True,
+            )
+        finally:
+            self._recover_task = None
+
+    def _schedule(self, target: Target):
+        if target.task is not None or target.handle is not None:
+            return
+        delay = target.backoff.next_delay()
+        self.debug(f"Retrying {target.key} in {delay:.1f}s")
+        target.handle = self.loop.call_later(delay, self._start, target)
+
+    def _start(self, target: Target):
+        target.handle = None
+        target.task = self.loop.create_task(
+            self._run(target), name=f"hyperhdr_mqtt_connect_{target.key}"
+        )
+
+    async def _run(self, target: Target):
+        try:
+            connected = await target.attempt()
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            self.debug(f"Connecting {target.key} failed: {ex}")
+            connected = False
+        target.task = None
+        if target is self.broker:
+            if not connected:
+                self._schedule(target)
+        elif target.key in self.targets:
+            self.set_connected(target.key, connected)
+            if connected and target.on_connected:
+                await target.on_connected()
+
+    def shutdown(self):
+        self.broker.cancel()
+        for target in self.targets.values():
+            target.cancel()
+        self.targets.clear()
+        if self._recover_task:
+            self._recover_task.cancel()
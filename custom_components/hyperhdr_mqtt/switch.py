@@ -71,15 +71,17 @@ class HyperHDRSwitch(HyperHDR_MQTT_Entity, SwitchEntity):
         if self.is_instance:
             return self.device.state
 
-        return self.device.components.as_dict().get(self._component)
+        return self.device.components.get(self._component)
 
     async def async_turn_on(self, **kwargs):
         if self.is_instance:
-            return self.device.set_instance(True)
+            await self.device.set_instance(True)
+            return
 
         await self.device.set_component(Components(self._component), True)
 
     async def async_turn_off(self, **kwargs):
         if self.is_instance:
-            return self.device.set_instance(False)
+            await self.device.set_instance(False)
+            return
         await self.device.set_component(Components(self._component), False)
@@ -0,0 +1,71 @@
+"""TLS contexts for the broker connections."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import ssl
+
+_LOGGER = logging.getLogger(__name__)
+
+SSL_CONTEXTS: dict[tuple, ResumingSSLContext] = {}
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSL context offering the last TLS session again when reconnecting.
+
+    Paho wraps a new socket for every reconnect, resuming the session skips
+    the certificate exchange of a full handshake.
+    """
+
+    session: ssl.SSLSession | None = None
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        if self.session is not None and kwargs.get("session") is None:
+            kwargs["session"] = self.session
+        return super().wrap_socket(sock, *args, **kwargs)
+
+    def save_session(self, sock):
+        """Keep the session of a connected socket for the next handshake."""
+        if not isinstance(sock, ssl.SSLSocket) or sock.session is None:
+            return
+        if sock.session_reused:
+            _LOGGER.debug("TLS session resumed")
+        self.session = sock.session
+
+
+def build_ssl_context(
+    certificate: str | None,
+    client_cert: str | None,
+    client_key: str | None,
+    insecure: bool,
+) -> ResumingSSLContext:
+    """Load the certificates, does blocking I/O."""
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if certificate:
+        context.load_verify_locations(certificate)
+    else:
+        context.load_default_certs()
+    if client_cert:
+        context.load_cert_chain(client_cert, client_key or None)
+    if insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def async_get_ssl_context(
+    host: str,
+    certificate: str | None,
+    client_cert: str | None,
+    client_key: str | None,
+    insecure: bool,
+) -> ResumingSSLContext:
+    """Return the SSL context of the broker, built once in the executor."""
+    key = (host, certificate, client_cert, client_key, insecure)
+    if (context := SSL_CONTEXTS.get(key)) is None:
+        context = await asyncio.get_running_loop().run_in_executor(
+            None, build_ssl_context, certificate, client_cert, client_key, insecure
+        )
+        SSL_CONTEXTS[key] = context
+    return context
@@ -0,0 +1,148 @@
+"""Client side light transitions for HyperHDR instances."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from typing import TYPE_CHECKING
+
+import homeassistant.util.color as color_util
+
+from .const import Adjustments
+
+if TYPE_CHECKING:
+    from .mqtt import HyperHDRInstance
+
+DEFAULT_TRANSITION_FPS = 10
+
+
+def lerp(start, end, progress):
+    return start + (end - start) * progress
+
+
+def lerp_hue(start, end, progress):
+    """Interpolate the hue over the shortest way around the color wheel."""
+    delta = (end - start + 180) % 360 - 180
+    return (start + delta * progress) % 360
+
+
+class TransitionScheduler:
+    """Fade brightness and color of an instance at a fixed frame rate.
+
+    Every frame sends one publish with the changed values only. Frames missed
+    while a publish lags are skipped, so a fade never sends more than
+    `duration * fps + 1` messages. A new transition or command cancels the
+    running one and continues from the last values that were sent.
+
+    `restore` payloads undo what the transition changed only to reach its end
+    (the brightness of a fade out). They go with the last frame, or back to
+    the caller when the transition is cancelled before.
+    """
+
+    def __init__(self, device: HyperHDRInstance, fps=DEFAULT_TRANSITION_FPS) -> None:
+        self.device = device
+        self.fps = max(1, int(fps))
+        self._task: asyncio.Task | None = None
+        self._brightness: int | None = None
+        self._hs: tuple[float, float] | None = None
+        self._rgb: tuple[int, int, int] | None = None
+        self._restore: list[str] = []
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def cancel(self) -> list[str]:
+        """Stop the running transition, returns its unsent `restore` payloads."""
+        restore = self.take_restore()
+        if self.running:
+            self._task.cancel()
+        self._task = None
+        return restore
+
+    def take_restore(self) -> list[str]:
+        """Hand the unsent `restore` payloads over to the caller."""
+        restore, self._restore = self._restore, []
+        return restore
+
+    async def start(
+        self,
+        duration: float,
+        brightness: int | None = None,
+        hs_color: tuple[float, float] | None = None,
+        final: list[str] | None = None,
+        restore: list[str] | None = None,
+    ):
+        """Start a fade towards `brightness` (0-100) and/or `hs_color`.
+
+        `final` then `restore` payloads are published together with the last
+        frame.
+        """
+        was_running = self.running
+        self.cancel()
+        self._restore = restore or []
+        if not was_running:
+            self._brightness = self.device.brightness
+            self._rgb = self.device.rgb_value or None
+            self._hs = color_util.color_RGB_to_hs(*self._rgb) if self._rgb else None
+
+        self._task = self.device.loop.create_task(
+            self._run(duration, brightness, hs_color, final or []),
+            name=f"hyperhdr_mqtt_transition_{self.device.selected_instance}",
+        )
+
+    async def _run(self, duration, brightness, hs_color, final):
+        device = self.device
+        start_brightness = self._brightness if brightness is not None else None
+        start_hs = self._hs if hs_color else None
+        frame_time = 1 / self.fps
+        loop = device.loop
+        begin = loop.time()
+        device.polling_paused = True
+        try:
+            while True:
+                elapsed = loop.time() - begin
+                progress = min(1.0, elapsed / duration) if duration > 0 else 1.0
+                last = progress >= 1.0
+
+                commands = []
+                if brightness is not None:
+                    value = brightness
+                    if start_brightness is not None and not last:
+                        value = round(lerp(start_brightness, brightness, progress))
+                    if value != self._brightness or last:
+                        self._brightness = value
+                        commands.append(
+                            await device.set_adjustment(
+                                Adjustments.BRIGHTNESS, value, True
+                            )
+                        )
+                if hs_color:
+                    hs = hs_color
+                    if start_hs and not last:
+                        hs = (
+                            lerp_hue(start_hs[0], hs_color[0], progress),
+                            lerp(start_hs[1], hs_color[1], progress),
+                        )
+                    self._hs = hs
+                    rgb = color_util.color_hs_to_RGB(*hs)
+                    if rgb != self._rgb or last:
+                        self._rgb = rgb
+                        commands.append(await device.set_color(rgb, True))
+                if last:
+                    commands.extend(final)
+                    commands.extend(self.take_restore())
+
+                if commands:
+                    await device.publish(commands, last)
+                if last:
+                    break
+
+                # Wait for the next frame boundary, skipping the ones we lagged behind.
+                elapsed = loop.time() - begin
+                next_frame = (math.floor(elapsed / frame_time) + 1) * frame_time
+                await asyncio.sleep(next_frame - elapsed)
+        finally:
+            # A retarget already replaced the task and keeps polling paused.
+            if self._task in (None, asyncio.current_task()):
+                device.polling_paused = False
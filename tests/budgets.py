@@ -0,0 +1,69 @@
+"""Performance budgets and probes shared by the tests.
+
+Every budget can be overridden with an environment variable, e.g.
+`HYPERHDR_BUDGET_LOOP_LAG_MS=50 pytest tests`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+
+def budget(name: str, default: float) -> float:
+    return float(os.environ.get(f"HYPERHDR_BUDGET_{name}", default))
+
+
+def env_list(name: str, default: str) -> list[int]:
+    return [int(value) for value in os.environ.get(name, default).split(",")]
+
+
+class LoopLagProbe:
+    """Measure how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.max_lag = 0.0
+        self.samples = 0
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - start - self.interval
+            self.samples += 1
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    @property
+    def max_lag_ms(self) -> float:
+        return self.max_lag * 1000
+
+
+def integration_tasks() -> set[asyncio.Task]:
+    """Running tasks created by the integration."""
+    return {
+        task
+        for task in asyncio.all_tasks()
+        if not task.done() and "hyperhdr_mqtt" in task.get_name()
+    }
+
+
+async def wait_for(condition, timeout: float = 5, interval: float = 0.01) -> float:
+    """Wait until `condition()` is true, returns the elapsed seconds."""
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise AssertionError(f"Condition not met within {timeout}s")
+        await asyncio.sleep(interval)
+    return time.perf_counter() - start
@@ -0,0 +1,135 @@
+"""Fixtures for the HyperHDR MQTT tests."""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import CONF_PASSWORD, CONF_PORT, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.hyperhdr_mqtt import broker as broker_module, mqtt
+from custom_components.hyperhdr_mqtt.const import (
+    CONF_BROKER,
+    CONF_PRIORITY,
+    CONF_TOPIC,
+    DOMAIN,
+)
+from custom_components.hyperhdr_mqtt.mqtt import HyperHDRInstance
+
+from .budgets import budget, wait_for
+from .fake_broker import FakeBroker
+from .hyperhdr_sim import SimulatedServer
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+PRIORITY = 50
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load the integration from custom_components."""
+    yield
+
+
+@pytest.fixture
+async def fake_broker(hass: HomeAssistant):
+    """Replace the paho client with the in-process broker."""
+    fake = FakeBroker(hass.loop)
+    with patch.object(broker_module.mqtt, "Client", fake.client):
+        yield fake
+    # Connections stay open for a moment after their last user, close them
+    # so no timer outlives the test.
+    for connection in list(broker_module.CONNECTIONS.values()):
+        connection.close()
+    for manager, expiry in list(mqtt.PROBES.values()):
+        expiry.cancel()
+        manager.disconnect()
+    mqtt.PROBES.clear()
+
+
+@pytest.fixture
+def server(request, fake_broker) -> SimulatedServer:
+    """A simulated server, parametrize it indirectly with its keyword arguments.
+
+    pytestmark = pytest.mark.parametrize("server", [{"instances": 2}], indirect=True)
+    """
+    return SimulatedServer(fake_broker, "HyperHDR", **getattr(request, "param", {}))
+
+
+@pytest.fixture
+async def entry(hass: HomeAssistant, request, server) -> MockConfigEntry:
+    """The set up config entry of `server`, unloaded after the test."""
+    entry = await setup_server(hass, server, **getattr(request, "param", {}))
+    yield entry
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+@pytest.fixture
+def devices(hass: HomeAssistant, entry) -> dict[int, HyperHDRInstance]:
+    return hass.data[DOMAIN][entry.entry_id].isntances_data
+
+
+def entry_data(topic: str, **options) -> dict:
+    return {
+        CONF_BROKER: "broker.local",
+        CONF_PORT: 1883,
+        CONF_USERNAME: "user",
+        CONF_PASSWORD: "password",
+        CONF_TOPIC: topic,
+        CONF_PRIORITY: PRIORITY,
+        **options,
+    }
+
+
+async def setup_server(
+    hass: HomeAssistant, server: SimulatedServer, **options
+) -> MockConfigEntry:
+    """Add and set up a config entry for the simulated server."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title=server.topic,
+        unique_id=server.topic,
+        data=entry_data(server.topic, **options),
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
+
+
+def entity_id(hass: HomeAssistant, platform: str, unique_id: str) -> str:
+    entity = er.async_get(hass).async_get_entity_id(platform, DOMAIN, unique_id)
+    assert entity, f"No {platform} entity {unique_id}"
+    return entity
+
+
+async def timed_call(
+    hass: HomeAssistant,
+    server: SimulatedServer,
+    domain: str,
+    service: str,
+    data: dict,
+    condition,
+) -> tuple[int, float]:
+    """Call a service and wait for `condition()`.
+
+    Returns the messages the server received meanwhile, heartbeats excluded,
+    and the seconds from the call to the condition being met.
+    """
+    received = server.received - server.heartbeats
+    start = time.perf_counter()
+    await hass.services.async_call(domain, service, data, blocking=True)
+    await wait_for(condition)
+    return server.received - server.heartbeats - received, time.perf_counter() - start
+
+
+def assert_budgets(messages: int, elapsed: float):
+    """The budgets of a single command, as returned by `timed_call`."""
+    assert messages <= budget("COMMAND_MESSAGES", 2)
+    assert elapsed * 1000 <= budget("COMMAND_LATENCY_MS", 500)
@@ -0,0 +1,173 @@
+"""In-process MQTT broker stand-in and a paho compatible client."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """MQTT topic filter matching with `+` and `#`."""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part not in ("+", topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+@dataclass
+class Message:
+    topic: str
+    payload: bytes
+    qos: int = 0
+    retain: bool = False
+
+
+class FakeBroker:
+    """Route publishes between fake clients and in-process subscribers.
+
+    Deliveries go through the event loop so a publish never answers inside
+    the call of the publisher, like a real network round trip.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.clients: list[FakeClient] = []
+        # In-process subscribers like the simulated HyperHDR servers.
+        self.listeners: list[tuple[str, Callable[[str, bytes], None]]] = []
+        self.published: Counter[str] = Counter()
+        self.delivered = 0
+        # CONNACK code for the next connects, 0 accepts.
+        self.refuse_rc = 0
+        # Keep the subscriptions of persistent sessions across reconnects.
+        self.keep_sessions = False
+
+    def client(self, *args, **kwargs) -> FakeClient:
+        """Drop-in for `paho.mqtt.client.Client`."""
+        client = FakeClient(self, *args, **kwargs)
+        self.clients.append(client)
+        return client
+
+    def listen(self, pattern: str, callback: Callable[[str, bytes], None]):
+        self.listeners.append((pattern, callback))
+
+    def publish(self, topic: str, payload: bytes | str):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.published[topic] += 1
+        for pattern, callback in self.listeners:
+            if topic_matches(pattern, topic):
+                self.delivered += 1
+                self.loop.call_soon(callback, topic, payload)
+        for client in self.clients:
+            if client.connected and client.subscribed(topic):
+                self.delivered += 1
+                self.loop.call_soon(client.deliver, Message(topic, payload))
+
+    def drop_clients(self, rc: int = 1):
+        """Simulate a broker restart, every client gets disconnected."""
+        for client in self.clients:
+            client.drop(rc)
+
+    def count(self, suffix: str = "") -> int:
+        return sum(n for topic, n in self.published.items() if topic.endswith(suffix))
+
+
+class FakeClient:
+    """The part of the paho client API used by the integration."""
+
+    def __init__(self, broker: FakeBroker, client_id="", *args, **kwargs) -> None:
+        self.broker = broker
+        self.client_id = client_id
+        self.kwargs = kwargs
+        self.connected = False
+        self.subscriptions: set[str] = set()
+        self.on_message = None
+        self.on_connect = None
+        self.on_disconnect = None
+        self._connecting = False
+        # MQTT 3.1.1 asks for it when creating the client, MQTT 5 on connect.
+        self._clean = kwargs.get("clean_session", True)
+        self._session = False
+
+    def username_pw_set(self, username=None, password=None):
+        self.username = username
+
+    def tls_set_context(self, context):
+        self.tls_context = context
+
+    def tls_insecure_set(self, value):
+        pass
+
+    def connect(self, host, port=1883, *args, **kwargs):
+        self._clean = kwargs.get("clean_start", self._clean)
+        self._connecting = True
+
+    def reconnect(self):
+        self._connecting = True
+
+    def loop_start(self):
+        # paho runs the handshake on its network thread, do it on the loop.
+        if self._connecting:
+            self._connecting = False
+            self.broker.loop.call_soon_threadsafe(self._handshake)
+
+    def loop_stop(self):
+        pass
+
+    def _handshake(self):
+        if rc := self.broker.refuse_rc:
+            self.on_connect(self, None, {"session present": 0}, rc)
+            self.drop(rc)
+            return
+        self.connected = True
+        present = self._session and not self._clean and self.broker.keep_sessions
+        if not present:
+            self.subscriptions.clear()
+        self._session = True
+        self.on_connect(self, None, {"session present": int(present)}, 0)
+
+    def drop(self, rc: int = 1):
+        if not self.connected and rc == 1:
+            return
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self, None, rc)
+
+    def disconnect(self):
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self, None, 0)
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def socket(self):
+        return None
+
+    def subscribe(self, topic, qos=0):
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        self.subscriptions.update(t for t, _ in topics)
+        return (0, 1)
+
+    def unsubscribe(self, topic):
+        self.subscriptions.discard(topic)
+        return (0, 1)
+
+    def subscribed(self, topic: str) -> bool:
+        return any(topic_matches(pattern, topic) for pattern in self.subscriptions)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if self.connected:
+            self.broker.publish(topic, payload)
+
+    def deliver(self, message: Message):
+        if self.connected and self.on_message:
+            self.on_message(self, None, message)
@@ -0,0 +1,179 @@
+"""Simulated HyperHDR servers answering the JSON API over the fake broker."""
+
+from __future__ import annotations
+
+import json
+
+from .fake_broker import FakeBroker
+
+COMPONENTS = (
+    "ALL",
+    "HDR",
+    "SMOOTHING",
+    "BLACKBORDER",
+    "FORWARDER",
+    "VIDEOGRABBER",
+    "SYSTEMGRABBER",
+    "LEDDEVICE",
+)
+EFFECTS = ("Rainbow swirl", "Atomic swirl", "Knight rider", "Music: fullscreen")
+GRABBER_PRIORITY = 240
+
+
+def led_layout(count: int) -> list[dict]:
+    """LEDs around the screen edges, clockwise from the top left."""
+    side = max(1, count // 4)
+    leds = []
+    for i in range(count):
+        edge, pos = divmod(i, side)
+        step = 1 / side
+        if edge == 0:
+            box = (pos * step, (pos + 1) * step, 0, 0.1)
+        elif edge == 1:
+            box = (0.9, 1, pos * step, (pos + 1) * step)
+        elif edge == 2:
+            box = (1 - (pos + 1) * step, 1 - pos * step, 0.9, 1)
+        else:
+            box = (0, 0.1, 1 - (pos + 1) * step, 1 - pos * step)
+        leds.append(dict(zip(("hmin", "hmax", "vmin", "vmax"), box)))
+    return leds
+
+
+class SimulatedInstance:
+    def __init__(self, index: int, leds: int) -> None:
+        self.index = index
+        self.name = f"Instance {index}"
+        self.running = True
+        self.components = {name: True for name in COMPONENTS}
+        self.brightness = 100
+        self.rgb = [255, 255, 255]
+        self.effect: str | None = None
+        self.priorities: dict[int, dict] = {
+            GRABBER_PRIORITY: {"componentId": "VIDEOGRABBER", "origin": "System"}
+        }
+        self.leds = led_layout(leds)
+
+
+class SimulatedServer:
+    """One HyperHDR process with its instances, listening on `<topic>/JsonAPI`.
+
+    Every received command list is answered with one response list, switchTo
+    selects the instance of the following commands like the real server.
+    """
+
+    def __init__(
+        self, broker: FakeBroker, topic: str, instances: int = 1, leds: int = 60
+    ) -> None:
+        self.broker = broker
+        self.topic = topic
+        self.instances = [SimulatedInstance(i, leds) for i in range(instances)]
+        self.online = True
+        self.received = 0
+        # Received messages that were heartbeats (a sysinfo request).
+        self.heartbeats = 0
+        self.commands: list[dict] = []
+        # The active video grabber, reported by every instance.
+        self.grabber = "Simulated grabber"
+        self._current = 0
+        broker.listen(f"{topic}/JsonAPI", self.on_command)
+
+    def on_command(self, topic: str, payload: bytes):
+        if not self.online:
+            return
+        self.received += 1
+        commands = json.loads(payload.decode())
+        single = isinstance(commands, dict)
+        if single:
+            commands = [commands]
+        if any(command.get("command") == "sysinfo" for command in commands):
+            self.heartbeats += 1
+        responses = [self.handle(command) for command in commands]
+        self.broker.publish(
+            f"{self.topic}/JsonAPI/response",
+            json.dumps(responses[0] if single else responses),
+        )
+
+    def handle(self, command: dict) -> dict:
+        self.commands.append(command)
+        name = command.get("command")
+        response = {"command": name, "success": True, "tan": command.get("tan", 0)}
+        instance = self.instances[self._current]
+
+        if name == "instance":
+            target = command.get("instance", 0)
+            subcommand = command.get("subcommand")
+            response["command"] = f"instance-{subcommand}"
+            if target >= len(self.instances):
+                response["success"] = False
+            elif subcommand == "switchTo":
+                # A stopped instance answers the next commands with "Not ready".
+                response["success"] = self.instances[target].running
+                self._current = target
+            elif subcommand == "startInstance":
+                self.instances[target].running = True
+            elif subcommand == "stopInstance":
+                self.instances[target].running = False
+        elif not instance.running:
+            response.update(success=False, error="Not ready")
+        elif name == "serverinfo":
+            response["info"] = self.serverinfo(instance)
+        elif name == "sysinfo":
+            response["info"] = {"system": {"hostName": self.topic}}
+        elif name == "componentstate":
+            state = command["componentstate"]
+            instance.components[state["component"]] = state["state"]
+        elif name == "adjustment":
+            adjustment = command["adjustment"]
+            instance.brightness = adjustment.get("brightness", instance.brightness)
+        elif name == "color":
+            instance.rgb = list(command["color"])
+            instance.effect = None
+            instance.priorities[int(command["priority"])] = {
+                "componentId": "COLOR",
+                "origin": command.get("origin"),
+            }
+        elif name == "effect":
+            instance.effect = command["effect"]["name"]
+            instance.priorities[int(command["priority"])] = {
+                "componentId": "EFFECT",
+                "origin": command.get("origin"),
+            }
+        elif name == "clear":
+            instance.priorities.pop(int(command["priority"]), None)
+        return response
+
+    def serverinfo(self, instance: SimulatedInstance) -> dict:
+        visible = min(instance.priorities, default=None)
+        return {
+            "hostname": self.topic,
+            "currentInstance": instance.index,
+            "instance": [
+                {
+                    "instance": i.index,
+                    "friendly_name": i.name,
+                    "running": i.running,
+                }
+                for i in self.instances
+            ],
+            "components": [
+                {"name": name, "enabled": enabled}
+                for name, enabled in instance.components.items()
+            ],
+            "adjustment": [{"brightness": instance.brightness}],
+            "activeLedColor": [{"RGB Value": instance.rgb}],
+            "activeEffects": [{"name": instance.effect}] if instance.effect else [],
+            "effects": [{"name": name} for name in EFFECTS],
+            "priorities": [
+                {
+                    "priority": priority,
+                    "active": True,
+                    "visible": priority == visible,
+                    "owner": "",
+                    **source,
+                }
+                for priority, source in instance.priorities.items()
+            ],
+            "leds": instance.leds,
+            "grabbers": {"active": [self.grabber]},
+            "ledDevices": {"available": ["adalight"]},
+        }
@@ -0,0 +1,98 @@
+"""Ambient colors computed from the LED frames."""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from custom_components.hyperhdr_mqtt.ambient import AmbientColors, to_hex
+
+from .budgets import budget
+
+RED, GREEN, BLUE, BLACK = (255, 0, 0), (0, 255, 0), (0, 0, 255), (0, 0, 0)
+PER_EDGE = 4
+
+
+def edge_centers() -> np.ndarray:
+    """PER_EDGE LED centers in the middle of every edge: top, bottom, left, right."""
+    middle = 0.275 + 0.15 * np.arange(PER_EDGE)
+    edges = ((middle, 0.05), (middle, 0.95), (0.05, middle), (0.95, middle))
+    return np.concatenate(
+        [np.stack(np.broadcast_arrays(x, y), axis=1) for x, y in edges]
+    )
+
+
+def frame(*edges) -> np.ndarray:
+    """A frame with one color per edge, in the order of `edge_centers`."""
+    return np.array([rgb for rgb in edges for _ in range(PER_EDGE)], dtype=np.uint8)
+
+
+def test_zones_mean_dominant():
+    ambient = AmbientColors()
+    ambient.set_centers(edge_centers())
+
+    assert ambient.process(frame(RED, BLUE, GREEN, RED))
+    assert ambient.colors == {
+        "mean": (128, 64, 64),
+        "dominant": RED,
+        "top": RED,
+        "bottom": BLUE,
+        "left": GREEN,
+        "right": RED,
+    }
+    assert to_hex(ambient.colors["dominant"]) == "#ff0000"
+
+
+def test_dominant_ignores_black():
+    ambient = AmbientColors()
+    ambient.set_centers(edge_centers())
+
+    assert ambient.process(frame(BLACK, BLACK, BLACK, GREEN))
+    assert ambient.colors["dominant"] == GREEN
+    # All black is still a color.
+    ambient = AmbientColors()
+    assert ambient.process(frame(BLACK, BLACK, BLACK, BLACK))
+    assert ambient.colors["dominant"] == BLACK
+
+
+def test_without_layout_zones_are_the_mean():
+    ambient = AmbientColors()
+
+    assert ambient.process(frame(RED, BLUE, BLUE, RED))
+    colors = ambient.colors
+    assert colors["mean"] == (128, 0, 128)
+    assert all(colors[zone] == colors["mean"] for zone in ("top", "left"))
+
+
+def test_smoothing_and_threshold():
+    ambient = AmbientColors(smoothing=0.5, threshold=6)
+    ambient.set_centers(edge_centers())
+    dark = (100, 100, 100)
+
+    assert ambient.process(frame(dark, dark, dark, dark))
+    # Moves the smoothed colors by 2, below the threshold.
+    assert not ambient.process(frame(*[(104, 100, 100)] * 4))
+    assert ambient.colors["mean"] == (100, 100, 100)
+    # Half way to the new color.
+    assert ambient.process(frame(*[(200, 100, 100)] * 4))
+    assert ambient.colors["mean"] == (151, 100, 100)
+
+
+def test_frame_cpu_budget():
+    """Every stream frame runs this on the event loop."""
+    leds = 300
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, (50, leds, 3), dtype=np.uint8)
+    centers = np.stack(((np.arange(leds) + 0.5) / leds, np.full(leds, 0.05)), axis=1)
+    ambient = AmbientColors()
+    ambient.set_centers(centers)
+    ambient.process(frames[0])
+
+    runs = 1000
+    start = time.perf_counter()
+    for i in range(runs):
+        ambient.process(frames[i % len(frames)])
+    per_frame_us = (time.perf_counter() - start) / runs * 1e6
+
+    assert per_frame_us <= budget("AMBIENT_FRAME_US", 200)
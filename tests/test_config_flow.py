@@ -0,0 +1,19 @@
+"""Config and options flow."""
+
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.hyperhdr_mqtt.const import (
+    CONF_CERTIFICATE,
+    CONF_CLIENT_CERT,
+    CONF_CLIENT_KEY,
+)
+
+
+async def test_options_clear_certificates(hass: HomeAssistant, entry):
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    # A cleared field isn't submitted, it must not fall back to the entry data.
+    options = result["data_schema"]({})
+    for key in (CONF_CERTIFICATE, CONF_CLIENT_CERT, CONF_CLIENT_KEY):
+        assert options[key] == ""
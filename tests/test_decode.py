@@ -0,0 +1,66 @@
+"""Ordering of the messages around the executor decodes."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from custom_components.hyperhdr_mqtt import decode as decode_module
+from custom_components.hyperhdr_mqtt.decode import Decoder
+
+from .budgets import wait_for
+
+THRESHOLD = 100
+
+
+def message(n: int, size: int = 0) -> bytes:
+    return json.dumps({"n": n, "pad": "x" * size}).encode()
+
+
+def blocking_decode(release: threading.Event):
+    """`decode` holding the large messages until `release` is set."""
+    original = decode_module.decode
+
+    def decode(msg: bytes):
+        if len(msg) >= THRESHOLD:
+            release.wait(5)
+        return original(msg)
+
+    return patch.object(decode_module, "decode", decode)
+
+
+async def test_small_messages_wait_for_the_large_one():
+    received = []
+    decoder = Decoder(
+        asyncio.get_running_loop(), lambda data: received.append(data["n"]), THRESHOLD
+    )
+    release = threading.Event()
+    with blocking_decode(release):
+        decoder.feed(message(0))
+        decoder.feed(message(1, THRESHOLD))
+        decoder.feed(message(2))
+        decoder.feed(message(3, THRESHOLD))
+        decoder.feed(message(4))
+        await asyncio.sleep(0.05)
+        assert received == [0]
+
+        release.set()
+        await wait_for(lambda: len(received) == 5)
+    assert received == [0, 1, 2, 3, 4]
+
+
+async def test_close_drops_the_queued_messages():
+    received = []
+    decoder = Decoder(
+        asyncio.get_running_loop(), lambda data: received.append(data["n"]), THRESHOLD
+    )
+    release = threading.Event()
+    with blocking_decode(release):
+        decoder.feed(message(0, THRESHOLD))
+        decoder.feed(message(1))
+        decoder.close()
+        release.set()
+        await asyncio.sleep(0.1)
+    assert received == []
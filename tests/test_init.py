@@ -0,0 +1,100 @@
+"""Setup and unload of a config entry."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import STATE_ON
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.hyperhdr_mqtt import broker, mqtt
+from custom_components.hyperhdr_mqtt.const import DOMAIN
+from custom_components.hyperhdr_mqtt.effects import SAVE_DELAY
+
+from .budgets import budget, integration_tasks
+from .conftest import entity_id, entry_data, setup_server
+from .hyperhdr_sim import SimulatedServer
+
+
+async def test_setup_unload(hass: HomeAssistant, fake_broker):
+    server = SimulatedServer(fake_broker, "HyperHDR", instances=2)
+    entry = await setup_server(hass, server)
+
+    devices = hass.data[DOMAIN][entry.entry_id].isntances_data
+    assert set(devices) == {0, 1}
+    assert all(dev.connected for dev in devices.values())
+    assert (
+        hass.states.get(entity_id(hass, "light", "HyperHDR_0_light")).state == STATE_ON
+    )
+    assert (
+        hass.states.get(entity_id(hass, "switch", "HyperHDR_1_instance")).state
+        == STATE_ON
+    )
+
+    # serverinfo while connecting, then one resync for all the instances.
+    assert server.received <= budget("SETUP_MESSAGES", 2)
+    # The instances just synced, nothing is polled again right away.
+    received = server.received - server.heartbeats
+    await asyncio.sleep(1)
+    assert server.received - server.heartbeats == received
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    await asyncio.sleep(0.05)
+    assert entry.state is ConfigEntryState.NOT_LOADED
+    assert not integration_tasks()
+
+
+async def test_setup_twice_shares_the_broker(hass: HomeAssistant, fake_broker):
+    servers = [SimulatedServer(fake_broker, f"HyperHDR{n}") for n in range(2)]
+    entries = [await setup_server(hass, server) for server in servers]
+
+    assert len(fake_broker.clients) == 1
+    for entry in entries:
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    await asyncio.sleep(0.05)
+    assert not integration_tasks()
+
+
+async def test_setup_retries_offline_server(hass: HomeAssistant, fake_broker):
+    server = SimulatedServer(fake_broker, "HyperHDR")
+    server.online = False
+    entry = MockConfigEntry(domain=DOMAIN, data=entry_data(server.topic))
+    entry.add_to_hass(hass)
+
+    with patch.object(mqtt, "SERVERINFO_TIMEOUT", 0.1):
+        for _ in range(2):
+            await hass.config_entries.async_setup(entry.entry_id)
+            await hass.async_block_till_done()
+            assert entry.state is ConfigEntryState.SETUP_RETRY
+            await hass.config_entries.async_unload(entry.entry_id)
+
+    # No handler left behind, the connection is released.
+    assert not any(connection.handlers for connection in broker.CONNECTIONS.values())
+
+
+async def test_remove_deletes_the_effect_catalog(
+    hass: HomeAssistant, fake_broker, hass_storage
+):
+    server = SimulatedServer(fake_broker, "HyperHDR")
+    entry = await setup_server(hass, server)
+    key = f"{DOMAIN}.effects.hyperhdr"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    # The delayed save is written on unload.
+    assert hass_storage[key]["data"]["effects"]
+
+    await hass.config_entries.async_remove(entry.entry_id)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=SAVE_DELAY + 1))
+    await hass.async_block_till_done()
+    assert key not in hass_storage
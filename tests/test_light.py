@@ -0,0 +1,158 @@
+"""Light commands, the messages they cost and how fast the state follows.
+
+A command is one publish, then a single fast poll brings the new states.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_EFFECT,
+    ATTR_HS_COLOR,
+    ATTR_TRANSITION,
+)
+from homeassistant.const import ATTR_ENTITY_ID, STATE_OFF, STATE_ON
+from homeassistant.core import HomeAssistant
+
+from .budgets import wait_for
+from .conftest import assert_budgets, entity_id, timed_call
+
+# Every test runs against a set up entry of the `server` fixture.
+pytestmark = pytest.mark.usefixtures("entry")
+
+
+async def test_turn_on_color_brightness(hass: HomeAssistant, server):
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+
+    def updated():
+        state = hass.states.get(light)
+        return (
+            state.attributes.get(ATTR_HS_COLOR) == (0, 100)
+            and state.attributes.get(ATTR_BRIGHTNESS) == 128
+        )
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "light",
+            "turn_on",
+            {ATTR_ENTITY_ID: light, ATTR_HS_COLOR: (0, 100), ATTR_BRIGHTNESS: 128},
+            updated,
+        )
+    )
+    instance = server.instances[0]
+    assert instance.rgb == [255, 0, 0]
+    assert instance.brightness == 50
+
+    # The fast polling stops once the new states arrived.
+    received = server.received - server.heartbeats
+    await asyncio.sleep(1)
+    assert server.received - server.heartbeats == received
+
+
+async def test_turn_off(hass: HomeAssistant, server):
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "light",
+            "turn_off",
+            {ATTR_ENTITY_ID: light},
+            lambda: hass.states.get(light).state == STATE_OFF,
+        )
+    )
+    assert server.instances[0].components["LEDDEVICE"] is False
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "light",
+            "turn_on",
+            {ATTR_ENTITY_ID: light},
+            lambda: hass.states.get(light).state == STATE_ON,
+        )
+    )
+
+
+async def test_effect(hass: HomeAssistant, server):
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "light",
+            "turn_on",
+            # Effect names are matched case insensitively.
+            {ATTR_ENTITY_ID: light, ATTR_EFFECT: "rainbow swirl"},
+            lambda: hass.states.get(light).attributes.get(ATTR_EFFECT)
+            == "Rainbow swirl",
+        )
+    )
+
+
+async def test_transition(hass: HomeAssistant, server):
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+    duration, fps = 1, 10
+
+    messages, _ = await timed_call(
+        hass,
+        server,
+        "light",
+        "turn_on",
+        {ATTR_ENTITY_ID: light, ATTR_BRIGHTNESS: 128, ATTR_TRANSITION: duration},
+        lambda: hass.states.get(light).attributes.get(ATTR_BRIGHTNESS) == 128,
+    )
+    # Turning on, at most a frame per 1 / fps and the poll after the last one.
+    assert messages <= 1 + duration * fps + 1 + 1
+
+
+async def test_transition_retarget(hass: HomeAssistant, server):
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+
+    for brightness in (128, 51):
+        await hass.services.async_call(
+            "light",
+            "turn_on",
+            {ATTR_ENTITY_ID: light, ATTR_BRIGHTNESS: brightness, ATTR_TRANSITION: 1},
+            blocking=True,
+        )
+        await asyncio.sleep(0.5)
+    await wait_for(lambda: hass.states.get(light).attributes.get(ATTR_BRIGHTNESS) == 51)
+
+    # The second fade continues from where the first one was, never back up.
+    sent = [
+        command["adjustment"]["brightness"]
+        for command in server.commands
+        if command.get("command") == "adjustment"
+    ]
+    assert sent == sorted(sent, reverse=True)
+    assert sent[-1] == 20
+
+
+async def test_turn_on_during_fade_out(hass: HomeAssistant, server):
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+
+    await hass.services.async_call(
+        "light",
+        "turn_off",
+        {ATTR_ENTITY_ID: light, ATTR_TRANSITION: 1},
+        blocking=True,
+    )
+    await asyncio.sleep(0.5)
+    await hass.services.async_call(
+        "light", "turn_on", {ATTR_ENTITY_ID: light}, blocking=True
+    )
+    # The brightness the fade out would have restored is sent right away.
+    await wait_for(lambda: server.instances[0].brightness == 100)
+    await asyncio.sleep(1)
+    assert server.instances[0].brightness == 100
+    assert server.instances[0].components["LEDDEVICE"] is True
@@ -0,0 +1,89 @@
+"""The token bucket shared by the instances of a server."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from custom_components.hyperhdr_mqtt.limiter import (
+    MAX_DEFERRED,
+    POLL_RESERVE,
+    Priority,
+    RateLimiter,
+)
+
+
+async def test_polls_leave_the_reserve_to_commands():
+    burst = 8
+    limiter = RateLimiter(rate=1, burst=burst)
+
+    polls = [await limiter.acquire(Priority.POLL) for _ in range(burst)]
+    reserve = int(burst * POLL_RESERVE)
+    assert polls.count(True) == burst - reserve
+    assert limiter.rejected == reserve
+    # The reserve is still there for the commands, without waiting.
+    for _ in range(reserve):
+        assert await limiter.acquire()
+    assert limiter.deferred == 0
+
+
+async def test_deferred_commands_in_order():
+    limiter = RateLimiter(rate=50, burst=1)
+    assert await limiter.acquire()
+    order = []
+
+    async def command(n: int):
+        assert await limiter.acquire()
+        order.append(n)
+
+    await asyncio.gather(*(command(n) for n in range(5)))
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.deferred == 5
+    # A poll never goes ahead of a waiting command.
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not await limiter.acquire(Priority.POLL)
+    assert await waiting
+
+
+async def test_too_many_deferred_commands_rejected():
+    limiter = RateLimiter(rate=1, burst=1)
+    assert await limiter.acquire()
+    waiting = [asyncio.ensure_future(limiter.acquire()) for _ in range(MAX_DEFERRED)]
+    await asyncio.sleep(0)
+
+    assert not await limiter.acquire()
+    assert limiter.rejected == 1
+    # Closing drops the waiting ones.
+    limiter.close()
+    assert await asyncio.gather(*waiting) == [False] * MAX_DEFERRED
+
+
+async def test_cancelled_waiter_returns_its_token():
+    rate = 20
+    limiter = RateLimiter(rate=rate, burst=1)
+    assert await limiter.acquire()
+
+    # Cancelled while waiting, the next one gets the token.
+    first = asyncio.ensure_future(limiter.acquire())
+    second = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    # Cancelled after being given the token, it goes back into the bucket.
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    time.sleep(1 / rate)
+    limiter._release()
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    deferred = limiter.deferred
+    assert await limiter.acquire()
+    assert limiter.deferred == deferred
+    limiter.close()
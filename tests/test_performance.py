@@ -0,0 +1,37 @@
+"""Grabber sensors parsed from serverinfo."""
+
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.hyperhdr_mqtt.performance import Metric, Performance
+
+from .budgets import wait_for
+from .conftest import entity_id
+
+
+async def test_parse(server):
+    performance = Performance()
+
+    assert performance.update(server.serverinfo(server.instances[0]))
+    assert performance.values == {Metric.GRABBER_DEVICE: "Simulated grabber"}
+    assert not performance.update(server.serverinfo(server.instances[0]))
+    # No active grabber, or a server without the section.
+    for info in ({"grabbers": {"active": []}}, {}):
+        performance.update(info)
+        assert performance.get(Metric.GRABBER_DEVICE) is None
+
+
+async def test_sensors(hass: HomeAssistant, server, devices):
+    device = devices[0]
+    grabber = entity_id(hass, "sensor", "HyperHDR_0_grabber device")
+    assert hass.states.get(grabber).state == "Simulated grabber"
+
+    # A new grabber only updates the performance sensors.
+    updates = []
+    update_callback = device.update_callback
+    device.update_callback = lambda: (updates.append(1), update_callback())
+    server.grabber = "USB capture"
+    device.sync_soon()
+    await wait_for(lambda: hass.states.get(grabber).state == "USB capture")
+    assert not updates
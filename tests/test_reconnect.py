@@ -0,0 +1,100 @@
+"""Broker restarts and servers that stop answering."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.const import STATE_ON, STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant
+
+from custom_components.hyperhdr_mqtt import mqtt
+from custom_components.hyperhdr_mqtt.const import CONF_SESSION, SESSION_PERSISTENT
+
+from .budgets import budget, integration_tasks, wait_for
+from .conftest import entity_id
+from .hyperhdr_sim import SimulatedServer
+
+pytestmark = pytest.mark.parametrize("server", [{"instances": 2}], indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def fast_heartbeat():
+    """A lost instance is noticed within a second, set before the entry."""
+    with (
+        patch.object(mqtt, "HEARTBEAT_INTERVAL", 0.2),
+        patch.object(mqtt, "HEARTBEAT_TIMEOUT", 0.1),
+    ):
+        yield
+
+
+def sent(server: SimulatedServer) -> int:
+    return server.received - server.heartbeats
+
+
+async def test_broker_restart(hass: HomeAssistant, fake_broker, server, devices):
+    fake_broker.drop_clients()
+    await wait_for(lambda: not any(dev.connected for dev in devices.values()))
+
+    received = sent(server)
+    await wait_for(lambda: all(dev.connected for dev in devices.values()))
+    # All the instances are synced in one batch.
+    assert sent(server) - received <= budget("RESYNC_MESSAGES", 1)
+    await asyncio.sleep(1)
+    assert sent(server) - received <= budget("RESYNC_MESSAGES", 1)
+    assert len(fake_broker.clients) == 1
+
+
+@pytest.mark.parametrize("entry", [{CONF_SESSION: SESSION_PERSISTENT}], indirect=True)
+async def test_broker_restart_resumed_session(
+    hass: HomeAssistant, fake_broker, server, devices
+):
+    fake_broker.keep_sessions = True
+    fake_broker.drop_clients()
+    await wait_for(lambda: not any(dev.connected for dev in devices.values()))
+    subscriptions = set(fake_broker.clients[0].subscriptions)
+
+    received = sent(server)
+    await wait_for(lambda: all(dev.connected for dev in devices.values()))
+    # The broker kept the subscriptions, nothing to resync.
+    await asyncio.sleep(1)
+    assert sent(server) == received
+    assert fake_broker.clients[0].subscriptions == subscriptions
+
+
+async def test_commands_kept_while_disconnected(
+    hass: HomeAssistant, fake_broker, server, devices
+):
+    dev = devices[0]
+    fake_broker.drop_clients()
+    await wait_for(lambda: not dev.connected)
+
+    received = sent(server)
+    await dev.set_color((0, 255, 0))
+    await dev.set_color((0, 0, 255))
+    assert sent(server) == received
+
+    await wait_for(lambda: dev.rgb_value == (0, 0, 255))
+    # Resync, the kept commands in one batch and the poll after it.
+    assert sent(server) - received <= budget("RESYNC_MESSAGES", 1) + 2
+    colors = [c["color"] for c in server.commands if c.get("command") == "color"]
+    assert colors == [[0, 0, 255]]
+
+
+async def test_instance_lost_and_back(hass: HomeAssistant, server, devices):
+    dev = devices[0]
+    light = entity_id(hass, "light", "HyperHDR_0_light")
+
+    server.online = False
+    await wait_for(lambda: not dev.connected)
+    await wait_for(lambda: hass.states.get(light).state == STATE_UNAVAILABLE)
+    server.online = True
+    await wait_for(lambda: dev.connected)
+    await wait_for(lambda: hass.states.get(light).state == STATE_ON)
+
+    # One poller per instance, none left over from before the loss.
+    names = [task.get_name() for task in integration_tasks()]
+    assert names.count("hyperhdr_mqtt_0") == 1
+    assert names.count("hyperhdr_mqtt_1") == 1
@@ -0,0 +1,99 @@
+"""Scale test: many simulated servers and instances against one broker.
+
+The counts and budgets come from the environment:
+
+    HYPERHDR_SCALE_SERVERS=1,10,30     config entries, one server each
+    HYPERHDR_SCALE_INSTANCES=8         instances per server
+    HYPERHDR_SCALE_WINDOW=3            seconds of fast polling measured
+    HYPERHDR_BUDGET_KB_PER_INSTANCE    python memory per instance
+    HYPERHDR_BUDGET_TASKS_PER_INSTANCE tasks left running per instance
+    HYPERHDR_BUDGET_THREADS            threads started by the integration
+    HYPERHDR_BUDGET_LOOP_LAG_MS        worst event loop wake up delay
+    HYPERHDR_BUDGET_MSGS_PER_INSTANCE  minimum messages/s per fast polling instance
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import os
+import threading
+import tracemalloc
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.hyperhdr_mqtt.const import DOMAIN
+
+from .budgets import LoopLagProbe, budget, env_list
+from .conftest import setup_server
+from .hyperhdr_sim import SimulatedServer
+
+SERVERS = env_list("HYPERHDR_SCALE_SERVERS", "1,10")
+INSTANCES = int(os.environ.get("HYPERHDR_SCALE_INSTANCES", 8))
+WINDOW = float(os.environ.get("HYPERHDR_SCALE_WINDOW", 3))
+
+
+@pytest.mark.parametrize("servers", SERVERS)
+async def test_scale(hass: HomeAssistant, fake_broker, servers, record_property):
+    simulated = [
+        SimulatedServer(fake_broker, f"HyperHDR{n}", INSTANCES) for n in range(servers)
+    ]
+    count = servers * INSTANCES
+
+    # Import the platforms first, only the instances should be measured.
+    warmup = await setup_server(hass, SimulatedServer(fake_broker, "Warmup"))
+    assert await hass.config_entries.async_unload(warmup.entry_id)
+    await hass.async_block_till_done()
+
+    gc.collect()
+    tasks_before = len(asyncio.all_tasks())
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+
+    entries = [await setup_server(hass, server) for server in simulated]
+
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] - memory_before
+    tracemalloc.stop()
+    tasks = len(asyncio.all_tasks()) - tasks_before
+    threads = threading.active_count() - threads_before
+
+    devices = [
+        dev
+        for entry in entries
+        for dev in hass.data[DOMAIN][entry.entry_id].isntances_data.values()
+    ]
+    assert len(devices) == count
+    assert all(dev.connected for dev in devices)
+
+    # Every instance polls as fast as after a command during the window.
+    delivered = fake_broker.delivered
+    with LoopLagProbe() as lag:
+        for dev in devices:
+            dev.sync_soon()
+        await asyncio.sleep(WINDOW)
+    rate = (fake_broker.delivered - delivered) / WINDOW
+
+    report = {
+        "instances": count,
+        "kb_per_instance": round(memory / 1024 / count, 1),
+        "tasks_per_instance": round(tasks / count, 2),
+        "threads": threads,
+        "loop_lag_ms": round(lag.max_lag_ms, 1),
+        "messages_per_s": round(rate, 1),
+    }
+    for name, value in report.items():
+        record_property(name, value)
+
+    for entry in entries:
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert report["kb_per_instance"] <= budget("KB_PER_INSTANCE", 512)
+    assert report["tasks_per_instance"] <= budget("TASKS_PER_INSTANCE", 2)
+    assert threads <= budget("THREADS", 8)
+    assert report["loop_lag_ms"] <= budget("LOOP_LAG_MS", 250)
+    assert rate >= count * budget("MSGS_PER_INSTANCE", 1)
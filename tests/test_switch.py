@@ -0,0 +1,92 @@
+"""Component and instance switches."""
+
+from __future__ import annotations
+
+import pytest
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    STATE_OFF,
+    STATE_ON,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import HomeAssistant
+
+from custom_components.hyperhdr_mqtt.const import EVENT_CHANGE, Change
+
+from .budgets import wait_for
+from .conftest import assert_budgets, entity_id, timed_call
+
+pytestmark = [
+    pytest.mark.parametrize("server", [{"instances": 2}], indirect=True),
+    pytest.mark.usefixtures("entry"),
+]
+
+
+@pytest.mark.parametrize("instance", [0, 1])
+async def test_component(hass: HomeAssistant, server, instance):
+    switch = entity_id(hass, "switch", f"HyperHDR_{instance}_hdr")
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "switch",
+            "turn_off",
+            {ATTR_ENTITY_ID: switch},
+            lambda: hass.states.get(switch).state == STATE_OFF,
+        )
+    )
+    assert server.instances[instance].components["HDR"] is False
+    # Only the instance of the switch changed.
+    assert server.instances[1 - instance].components["HDR"] is True
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "switch",
+            "turn_on",
+            {ATTR_ENTITY_ID: switch},
+            lambda: hass.states.get(switch).state == STATE_ON,
+        )
+    )
+
+
+async def test_instance_stop_start(hass: HomeAssistant, server):
+    switch = entity_id(hass, "switch", "HyperHDR_1_instance")
+    light = entity_id(hass, "light", "HyperHDR_1_light")
+    events = async_capture_events(hass, EVENT_CHANGE)
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "switch",
+            "turn_off",
+            {ATTR_ENTITY_ID: switch},
+            lambda: hass.states.get(switch).state == STATE_OFF,
+        )
+    )
+    assert server.instances[1].running is False
+    await wait_for(lambda: hass.states.get(light).state == STATE_UNAVAILABLE)
+    assert [
+        (event.data["instance"], event.data["old"], event.data["new"])
+        for event in events
+        if event.data["field"] == Change.RUNNING
+    ] == [(1, True, False)]
+
+    assert_budgets(
+        *await timed_call(
+            hass,
+            server,
+            "switch",
+            "turn_on",
+            {ATTR_ENTITY_ID: switch},
+            lambda: hass.states.get(switch).state == STATE_ON,
+        )
+    )
+    assert server.instances[1].running is True
+    # The components of the started instance come back with its next poll.
+    await wait_for(lambda: hass.states.get(light).state == STATE_ON)